@@ -2,13 +2,16 @@
 Contains all possible command line arguments. Handles also the parsing of arguments.
 @author: Michael Fruth
 """
+import functools
+import itertools
 import logging
-import multiprocessing
-import pickle
+import os
+import stat
 from argparse import ArgumentParser, ArgumentTypeError, ArgumentError
 from os import path
 
 import _arguments_filter as args_filter
+import _util as util
 import filter_filters
 from _model import GitFile, SchemaDrafts, Subschema, SUBSCHEMA_IMPLEMENTATIONS
 
@@ -17,28 +20,51 @@ from _model import GitFile, SchemaDrafts, Subschema, SUBSCHEMA_IMPLEMENTATIONS
 # Start of methods used by the arguments parser
 #############################################################################
 
-def check_directory_exists(value):
-    if not path.isdir(value):
-        raise ArgumentTypeError("%s doesn't exist!" % value)
+@functools.lru_cache(maxsize=256)
+def _cached_realpath(value):
+    """
+    Returns the real path of the value. The result is cached, so the same path passed to multiple arguments is resolved
+    only once.
+    :param value: The path to resolve.
+    :return: The real path of the value.
+    """
     return path.realpath(value)
 
 
-def check_directory_not_exists(value):
-    if path.isdir(value):
-        raise ArgumentTypeError("%s already exists!" % value)
-    return path.realpath(value)
+def _check_path_exists(value, must_be_dir):
+    """
+    Checks the existence of a directory or file with only one stat-call.
+    :param value: The path to check.
+    :param must_be_dir: True if the path is a directory, False if the path is a file.
+    :return: The real path of the value.
+    """
+    try:
+        mode = os.stat(value).st_mode
+        exists = stat.S_ISDIR(mode) if must_be_dir else stat.S_ISREG(mode)
+    except (OSError, ValueError):
+        exists = False
 
+    if not exists:
+        raise ArgumentTypeError("%s doesn't exist!" % value)
+    return _cached_realpath(value)
 
-def check_file_not_exists(value):
-    if path.isfile(value):
-        raise ArgumentTypeError("%s already exists!" % value)
-    return path.realpath(value)
+
+def check_directory_exists(value):
+    return _check_path_exists(value, must_be_dir=True)
 
 
 def check_file_exists(value):
-    if not path.isfile(value):
-        raise ArgumentTypeError("%s doesn't exist!" % value)
-    return path.realpath(value)
+    return _check_path_exists(value, must_be_dir=False)
+
+
+def resolve_path(value):
+    """
+    Resolves the path without any checks. Use this for paths which are created later on (e.g. output files), so the
+    existence is checked when creating the path instead of checking it beforehand.
+    :param value: The path to resolve.
+    :return: The real path of the value.
+    """
+    return _cached_realpath(value)
 
 
 def check_int_greater_0(value):
@@ -57,6 +83,8 @@ def check_process_cores(value):
         if value < 0:
             raise ArgumentTypeError("%s is invalid!" % value)
         if value == 0:
+            # Import multiprocessing only when needed, because importing it slows down the startup of every script.
+            import multiprocessing
             value = multiprocessing.cpu_count()
             if value <= 0:
                 value = 1
@@ -137,13 +165,13 @@ class CLA:
 
     def load_value(self, args):
         """
-        Loads the value from the args (args is the result from parser.parse_args()) into self.value.
-        :param args: The parsed data from the parser (:ArgumentParser)
+        Loads the value from the args (args is the dictionary of the result from parser.parse_args()) into self.value.
+        :param args: The parsed data from the parser (:ArgumentParser) as dictionary (vars(parser.parse_args()))
         :return: None
         """
         if self.value is None:
             # Load value only if it is not set
-            self.value = getattr(args, self.get_destination())
+            self.value = args.get(self.get_destination())
 
     def do(self, data, **kwargs):
         """
@@ -167,12 +195,30 @@ class CLA:
         """
         pass
 
+    def do_records(self, records, **kwargs):
+        """
+        Executes do() on each record of the given records, one record after another. Only the records remaining after
+        do() are yielded.
+        Overwrite this method if the operation can not be executed on a single record (e.g. skipping records).
+        :param records: An iterable containing the records on which operations are executed.
+        :param kwargs: Arguments
+        :return: A generator yielding the remaining records.
+        """
+        for record in records:
+            data = [record]
+            self.do(data, **kwargs)
+            yield from data
+
 
 class CLAGroup(CLA):
     """
     Base class for mutually exclusive groups. The arguments for the group is stored in self.clas. This list contains only CLA-objects.
 
     The base-methods of CLA are overwritten to support the group. Most of the methods from the base-class CLA are forwarded to the arguments.
+
+    self.active_cla:
+    After parsing the arguments, this is the CLA of the group set by the user (or None if no CLA is set). The value of
+    this CLA is stored in self.value.
     """
     _required = False
 
@@ -181,6 +227,7 @@ class CLAGroup(CLA):
         self.arguments = None
 
         self.clas = []
+        self.active_cla = None
 
     def required(self):
         # Save an internal flag and do not call required on the clas, because only the group should be required, not every single argument.
@@ -190,7 +237,9 @@ class CLAGroup(CLA):
     def load_value(self, args):
         for cla in self.clas:
             cla.load_value(args)
-        self.value = [cla.value for cla in self.clas]
+        # Group is mutually exclusive - at most one CLA is set.
+        self.active_cla = next((cla for cla in self.clas if cla.value is not None), None)
+        self.value = self.active_cla.value if self.active_cla is not None else None
 
     def do_nothing(self):
         for cla in self.clas:
@@ -241,6 +290,17 @@ class CLAGitValidate(CLA):
         self.destination = ('-val', '--validate', 'validate')
 
 
+class CLABareMaster(CLA):
+    arguments = {
+        'help': 'The path to the bare-master repository (see git_history_cloner.py). The file changes are computed from its commits instead of the version-directories.',
+        'type': check_directory_exists
+    }
+
+    def __init__(self):
+        super().__init__()
+        self.destination = ('-b', '--bare-master', 'bare_master')
+
+
 class CLAGitRepo(CLA):
     arguments = {
         'help': 'The path or url to the git repository.',
@@ -254,8 +314,8 @@ class CLAGitRepo(CLA):
 
 class CLAOutputDirectory(CLA):
     arguments = {
-        'help': 'The output directory, in which the output is saved.',
-        'type': check_directory_not_exists
+        'help': 'The output directory, in which the output is saved. The directory must not exist.',
+        'type': resolve_path
     }
 
     def __init__(self):
@@ -265,8 +325,8 @@ class CLAOutputDirectory(CLA):
 
 class CLAOutputFile(CLA):
     arguments = {
-        'help': 'The file in which the output is stored.',
-        'type': check_file_not_exists
+        'help': 'The file in which the output is stored. The file must not exist.',
+        'type': resolve_path
     }
 
     def __init__(self):
@@ -283,6 +343,13 @@ class CLAPathsFilter(CLA):
     def __init__(self):
         super().__init__()
         self.destination = ('-p', '--paths', 'paths')
+        self.prefixes = None
+
+    def load_value(self, args):
+        super().load_value(args)
+        if self.value is not None:
+            # Create the tuple for str.startswith() once to avoid creating it on each call of do().
+            self.prefixes = tuple(self.value)
 
     def _do(self, data, **kwargs):
         """
@@ -291,10 +358,8 @@ class CLAPathsFilter(CLA):
         :param kwargs: Nothing recognized.
         :return: None.
         """
-        # Filter files based on their path.
-        for d in data[:]:
-            if not d.path.startswith(tuple(self.value)):
-                data.remove(d)
+        # Filter files based on their path. Rebuild the list in place instead of removing each item separately.
+        data[:] = [d for d in data if d.path.startswith(self.prefixes)]
 
 
 class CLACommitDirectory(CLA):
@@ -316,10 +381,12 @@ class CLACommitDirectory(CLA):
         """
         git_history_file_extraction_func = kwargs['git_history_file_extraction_func']
         if git_history_file_extraction_func is None:
-            [h.set_full_path(self.value) for f in data for h in f[0].history]
+            for f in data:
+                for h in f[0].history:
+                    h.set_full_path(self.value)
         else:
-            history_files = git_history_file_extraction_func(data)
-            [h.set_full_path(self.value) for h in history_files]
+            for h in git_history_file_extraction_func(data):
+                h.set_full_path(self.value)
 
 
 class CLANumberFilesFilter(CLA):
@@ -335,6 +402,11 @@ class CLANumberFilesFilter(CLA):
     def _do(self, data, **kwargs):
         del data[self.value:]
 
+    def do_records(self, records, **kwargs):
+        if self._do_nothing or self.value is None:
+            return records
+        return itertools.islice(records, self.value)
+
 
 class CLASkipFilesFilter(CLA):
     arguments = {
@@ -349,6 +421,11 @@ class CLASkipFilesFilter(CLA):
     def _do(self, data, **kwargs):
         del data[:self.value]
 
+    def do_records(self, records, **kwargs):
+        if self._do_nothing or self.value is None:
+            return records
+        return itertools.islice(records, self.value, None)
+
 
 class CLADraftFilterOnTheFlyFilter(CLA):
     arguments = {
@@ -393,8 +470,7 @@ class CLADraftFilterFileFilter(CLA):
         super().load_value(args)
         if self.value is not None:
             # Set the filter to avoid loading it multiple times.
-            with open(self.value, 'rb') as f:
-                self.draft_filter = pickle.load(f)
+            self.draft_filter = util.load_pickle_file(self.value)
 
     def _do(self, data, **kwargs):
         """
@@ -417,6 +493,26 @@ class CLADraftFilterGroup(CLAGroup):
         ]
 
 
+class CLAFileChangesSourceGroup(CLAGroup):
+    """
+    The source of the file changes: Either the version-directories (optionally validated by CLAGitValidate) or the
+    bare-master.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.clas = [
+            CLACommitDirectory(),
+            CLABareMaster()
+        ]
+
+    def load_value(self, args):
+        super().load_value(args)
+        if isinstance(self.active_cla, CLABareMaster) and args.get(CLAGitValidate().get_destination()) is not None:
+            # The commits of the bare-master are complete, there are no version-directories to validate
+            raise ArgumentTypeError("argument -val/--validate: not allowed with argument -b/--bare-master")
+
+
 class CLAMultiprocessingCores(CLA):
     arguments = {
         'help': "Specify the number of cores used for multiprocessing. 0 denotes the available cores on the machine.",
@@ -439,6 +535,17 @@ class CLASelfCheck(CLA):
         self.destination = ('-self', 'self_check')
 
 
+class CLACompress(CLA):
+    arguments = {
+        'help': "Compress the output file (zstandard must be installed).",
+        'action': 'store_true'
+    }
+
+    def __init__(self):
+        super().__init__()
+        self.destination = ('-z', '--compress', 'compress')
+
+
 class CLAInputFile(CLA):
     arguments = {
         'help': "The file which contains the data.",
@@ -522,7 +629,9 @@ def _parse_load_detailed_data(filter_func,
                               input_args: {} = None,
                               verbose=True,
                               is_files_change=False,
-                              git_history_file_extraction_func=None):
+                              is_filter=False,
+                              git_history_file_extraction_func=None,
+                              as_records=False):
     """
     Parses the arguments from the command line and loads all values set by the user. It is assumed that the default_args contains CLAInputFile and that this file is set.
     The input file is loaded and will be processed by the passed arguments. E.g. the data is filtered if a filter is set.
@@ -533,7 +642,9 @@ def _parse_load_detailed_data(filter_func,
     :param input_args: The arguments passed from outside which should be added to the default arguments.
     :param verbose: If verbose output should be printed.
     :param is_files_change: If produced data from the module git_extract_file_changes is loaded.
+    :param is_filter: If a filter-file produced by the module filter is loaded.
     :param git_history_file_extraction_func: The function to extract the GitHistoryFiles out of the loaded data.
+    :param as_records: If the records should be returned as generator (see process_input_file).
     :return:
     """
     if expected_default_args is None:
@@ -556,7 +667,9 @@ def _parse_load_detailed_data(filter_func,
                                         input_args,
                                         filter_func,
                                         git_history_file_extraction_func,
-                                        is_files_change)
+                                        is_files_change,
+                                        is_filter,
+                                        as_records)
 
     # Get all values from the passed arguments from outside
     values = [cla.value for cla in input_args.values()]
@@ -571,41 +684,84 @@ def _parse_load_detailed_data(filter_func,
 
 
 def process_input_file(input_file_path, default_args, input_args, filter_func,
-                       git_history_file_extraction_func=None, is_files_change=False):
+                       git_history_file_extraction_func=None, is_files_change=False, is_filter=False,
+                       as_records=False):
     """
     Processes the input file based on the passed arguments.
+    Data stored by util.append_pickle() is processed record by record while loading, so only the remaining records are
+    kept in memory.
     :param input_file_path: The path to the input file (pickled data).
     :param default_args: The default_args.
     :param input_args: The arguments from outside.
     :param filter_func: The function to filter the data.
     :param git_history_file_extraction_func: The function which extracts all GitHistoryFiles out of the loaded data.
     :param is_files_change: If produced data from the module git_extract_file_changes is loaded.
+    :param is_filter: If a filter-file produced by the module filter is loaded.
+    :param as_records: If the records (data stored by util.append_pickle()) should be returned as generator instead of
+    a list. The records are loaded and processed while the generator is consumed, so not all records have to be in
+    memory at the same time. The generator can be consumed only once.
     :return: the loaded data from the input_file_path
     """
-    with open(input_file_path, 'rb') as f:
-        git_files_data = pickle.load(f)
-
     # Prepare kwargs for do() of the clas.
     do_args = {
         'filter_func': filter_func,
         'git_history_file_extraction_func': git_history_file_extraction_func
     }
 
-    cla_values = list(default_args.values())
-    cla_values.extend(input_args.values())
+    cla_values = {**default_args, **input_args}.values()
 
-    # Process data based on the CLAs set and their specific do() implementation
     cla: CLA
+    if not is_files_change and not is_filter:
+        # Data is stored as records - process each record while loading
+        records = util.load_pickle_records(input_file_path)
+        for cla in cla_values:
+            records = cla.do_records(records, **do_args)
+        if as_records:
+            return records
+        return list(records)
+
+    # Stored by util.dump_pickle(), so the data might be compressed (e.g. filter.py -z)
+    git_files_data = util.load_pickle_file(input_file_path)
+
+    if is_files_change:
+        datas = [git_files_data[0], git_files_data[1]]  # git_files, git_deleted_files
+    else:
+        datas = [git_files_data]
+
+    cla_skip_files, cla_number_files = _fusable_skip_number_clas(cla_values)
+
+    # Process data based on the CLAs set and their specific do() implementation
     for cla in cla_values:
-        if is_files_change:
-            cla.do(git_files_data[0], **do_args)  # git_files
-            cla.do(git_files_data[1], **do_args)  # git_deleted_files
-        else:
-            cla.do(git_files_data, **do_args)
+        if cla is cla_number_files:
+            # Already applied together with the skip-filter
+            continue
+
+        for data in datas:
+            if cla is cla_skip_files:
+                # Skip and take the data with one slice instead of deleting the head and the tail separately
+                data[:] = data[cla_skip_files.value:cla_skip_files.value + cla_number_files.value]
+            else:
+                cla.do(data, **do_args)
 
     return git_files_data
 
 
+def _fusable_skip_number_clas(cla_values):
+    """
+    Finds the CLASkipFilesFilter and CLANumberFilesFilter which can be applied together as one slice. This is the case
+    if both are set and the number of data is taken directly after the data is skipped, so no other CLA sees the data
+    in between.
+    :param cla_values: The CLAs in the order they are applied.
+    :return: The CLASkipFilesFilter and CLANumberFilesFilter or (None, None) if they can't be applied together.
+    """
+    for cla, next_cla in zip(cla_values, itertools.islice(cla_values, 1, None)):
+        if isinstance(cla, CLASkipFilesFilter) and isinstance(next_cla, CLANumberFilesFilter):
+            if all(c.value is not None and not c._do_nothing for c in (cla, next_cla)):
+                return cla, next_cla
+            break
+    return None, None
+
+
 def parse_load_filter(arguments: {} = None, default_args: {} = None,
                       verbose=True) -> filter_filters.FileDraftFilter:
     return _parse_load_detailed_data(args_filter.filter_subschemas,
@@ -613,21 +769,26 @@ def parse_load_filter(arguments: {} = None, default_args: {} = None,
                                      expected_default_args=default_args_filter(),
                                      default_args=default_args,
                                      verbose=verbose,
+                                     is_filter=True,
                                      git_history_file_extraction_func=lambda data: [h for h in data.invalid_files])
 
 
-def parse_load_subschemas(arguments: {} = None, default_args: {} = None, verbose=True) -> [GitFile, [Subschema]]:
+def parse_load_subschemas(arguments: {} = None, default_args: {} = None, verbose=True,
+                          as_records=False) -> [GitFile, [Subschema]]:
     return _parse_load_detailed_data(args_filter.filter_subschemas,
                                      input_args=arguments,
                                      default_args=default_args,
-                                     verbose=verbose)
+                                     verbose=verbose,
+                                     as_records=as_records)
 
 
-def parse_load_schema_drafts(arguments: {} = None, default_args: {} = None, verbose=True) -> [GitFile, [SchemaDrafts]]:
+def parse_load_schema_drafts(arguments: {} = None, default_args: {} = None, verbose=True,
+                             as_records=False) -> [GitFile, [SchemaDrafts]]:
     return _parse_load_detailed_data(args_filter.filter_schema_drafts,
                                      input_args=arguments,
                                      default_args=default_args,
-                                     verbose=verbose)
+                                     verbose=verbose,
+                                     as_records=as_records)
 
 
 def parse_load_file_changes(arguments: {} = None, default_args: {} = None, verbose=True) -> [
@@ -655,19 +816,17 @@ def parse_load(arguments: {}, default_arguments: {} = None, verbose=True):
     if default_arguments is None:
         default_arguments = {}
 
-    keys_a = set(arguments.keys())
-    keys_b = set(default_arguments.keys())
-    intersection = keys_a & keys_b
-    # Intersection must be empty - otherwise there are overlapping keys and overlapping keys results in overlapping dest's for the parser.
-    if len(intersection) != 0:
+    merged_arguments = {**arguments, **default_arguments}
+    # Keys must not overlap (merged arguments are shorter otherwise) - overlapping keys results in overlapping dest's for the parser.
+    if len(merged_arguments) != len(arguments) + len(default_arguments):
         raise ValueError(
-            "Argument was specified multiple times! \narguments: {}\ndefault_arguments: {}".format(keys_a, keys_b))
+            "Argument was specified multiple times! \narguments: {}\ndefault_arguments: {}".format(
+                set(arguments.keys()), set(default_arguments.keys())))
 
     parser = ArgumentParser()
 
     cla: CLA
-    cla_values = list(arguments.values())
-    cla_values.extend(default_arguments.values())
+    cla_values = merged_arguments.values()
     # Add each cla to the parser
     for cla in cla_values:
         cla.add(parser)
@@ -676,18 +835,23 @@ def parse_load(arguments: {}, default_arguments: {} = None, verbose=True):
         cla_verbose = _CLAVerbose()
         cla_verbose.add(parser)
 
-    args = parser.parse_args()
+    # Access the parsed values as dictionary instead of looking up the attributes of the namespace.
+    args = vars(parser.parse_args())
 
     # Load all values
     for cla in cla_values:
-        cla.load_value(args)
+        try:
+            cla.load_value(args)
+        except ArgumentTypeError as e:
+            # Report invalid combinations of values the same way as the parser does
+            parser.error(str(e))
 
-    if getattr(args, cla_verbose.get_destination()):
+    if verbose and args.get(cla_verbose.get_destination()):
         logging.basicConfig(level=logging.INFO,
                             format='%(asctime)s,%(msecs)d | %(name)s | %(levelname)s | %(message)s',
                             datefmt='%d.%m.%Y %H:%M:%S')
         # Remove verbose from the args - the verbose value shouldn't be seen by anyone.
-        delattr(args, cla_verbose.get_destination())
+        del args[cla_verbose.get_destination()]
 
 #############################################################################
 # End of the methods parsing, loading and processing the arguments
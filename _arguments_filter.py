@@ -4,7 +4,7 @@ Contains all possible command line arguments. Handles also the parsing of argume
 """
 
 import logging
-from typing import Callable, Any, Union
+from typing import Callable, Any, Iterable
 
 from _model import GitFile, GitHistoryFile, Subschema, SchemaDrafts
 from filter_filters import DraftFilter
@@ -13,39 +13,58 @@ logger = logging.getLogger(__name__)
 
 
 def _filter(draft_filter: DraftFilter, items: [],
-            git_history_file_extraction_func: Callable[[Any], Union[GitHistoryFile, list]]):
+            git_history_file_extraction_func: Callable[[Any], Iterable[GitHistoryFile]],
+            valid_files: {str: bool} = None):
     """
     Applies the extraction_func on each itm in items and this result is applied to the filter. If the item is not valid, it is filtered.
     :param draft_filter: The filter to be applied.
     :param items: The items to filter.
-    :param git_history_file_extraction_func: The function, which extracts the GitHistoryFile out of a item.
+    :param git_history_file_extraction_func: The function, which extracts the GitHistoryFiles out of a item. The function
+    must return an iterable (e.g. a tuple for a single GitHistoryFile).
+    :param valid_files: Optional dictionary with the full_path of a GitHistoryFile as key and the result of the filter as
+    value. The filter is only applied to GitHistoryFiles not contained and the result is added, so the dictionary can be
+    shared between multiple calls to apply the filter only once per GitHistoryFile.
     :return: None. The items are manipulated directly.
     """
     if draft_filter is None:
         return
 
-    for item in items[:]:  # Copy list to remove easily items
-        do_remove = []  # Collect all items to remove
+    if valid_files is None:
+        # The same GitHistoryFile can be extracted from multiple items (e.g. successive Subschemas) - apply the filter
+        # only once per GitHistoryFile.
+        valid_files = {}
+
+    # Bind the methods used in the loop to local variables to avoid the attribute lookups on each iteration
+    draft_filter_is_valid = draft_filter.is_valid
+    valid_files_get = valid_files.get
 
-        # Extract the GitHistoryFile from the item
-        extractions = git_history_file_extraction_func(item)
+    kept_items = []  # Collect all items to keep and rebuild the list once, instead of removing each item
+    kept_items_append = kept_items.append
+    for item in items:
+        do_remove = []  # Collect all items to remove
 
-        if isinstance(extractions, list):
-            extractions: [GitHistoryFile] = extractions
-            for extraction in extractions:
+        # Extract the GitHistoryFiles from the item
+        extraction: GitHistoryFile
+        for extraction in git_history_file_extraction_func(item):
+            full_path = extraction.full_path
+            is_valid = valid_files_get(full_path)
+            if is_valid is None:
                 # change_type 'D' == Deleted
-                if extraction.change_type == 'D' or not draft_filter.is_valid(extraction):
-                    do_remove.append(extraction.full_path)
+                is_valid = extraction.change_type != 'D' and draft_filter_is_valid(extraction)
+                valid_files[full_path] = is_valid
+
+            if not is_valid:
+                do_remove.append(full_path)
+
+        if len(do_remove) > 0:
+            # We have GitHistoryFile-Paths to remove
+            if logger.isEnabledFor(logging.INFO):
+                # Join the paths only if the message is logged
+                logger.info("Filtered %s", "\n\t".join(do_remove))
         else:
-            extraction: GitHistoryFile = extractions
-            # change_type 'D' == Deleted
-            if extraction.change_type == 'D' or not draft_filter.is_valid(extraction):
-                do_remove.append(extraction.full_path)
+            kept_items_append(item)
 
-        if len(do_remove) > 0 and item in items:
-            # We have GitHistoryFile-Paths to remove and item is still in original items
-            items.remove(item)
-            logger.info("Filtered {}".format("\n\t".join(do_remove)))
+    items[:] = kept_items
 
 
 def filter_git_files(draft_filter: DraftFilter, git_files: [GitFile]):
@@ -59,36 +78,42 @@ def filter_git_files(draft_filter: DraftFilter, git_files: [GitFile]):
         return
 
     git_file: GitFile
-    for git_file in git_files[:]:  # Copy list to easily remove filtered elements
-        _filter(draft_filter, git_file.history, lambda git_history_file: git_history_file)
-        if len(git_file.history) == 0:
-            git_files.remove(git_file)
-            continue
+    for git_file in git_files:
+        _filter(draft_filter, git_file.history, lambda git_history_file: (git_history_file,))
+    # Remove all GitFiles without any history left
+    git_files[:] = [git_file for git_file in git_files if len(git_file.history) > 0]
 
 
 def _default_filter(draft_filter: DraftFilter, git_files_data: [GitFile, [Any]],
-                    git_history_file_extraction_func: Callable[[Any], Union[GitHistoryFile, list]]):
+                    git_history_file_extraction_func: Callable[[Any], Iterable[GitHistoryFile]]):
     """
     Filteres the given data based on the applied filter.
     :param draft_filter: The filter to be applied.
     :param git_files_data: The data to filter.
     :param git_history_file_extraction_func: A function to extract the GitHistoryFile out of the data.
     The data is iterated and for on each iteration, this method is called on the second value of the iterated data.
-    This method should return a single GitHistoryFile or a list containing GitHistoryFiles.
+    This method should return an iterable containing the GitHistoryFiles (e.g. a tuple for a single GitHistoryFile).
     :return: None. The filter manipulates the data directly.
     """
     if draft_filter is None:
         return
 
-    for git_file, any_data in git_files_data[:]:  # Copy list to easily remove filtered elements
-        filter_git_files(draft_filter, [git_file])
+    kept_git_files_data = []  # Collect all data to keep and rebuild the list once
+    for git_file_data in git_files_data:
+        git_file, any_data = git_file_data
+
+        # The data contains the same GitHistoryFiles as the history - share the results of the filter.
+        valid_files = {}
+        _filter(draft_filter, git_file.history, lambda git_history_file: (git_history_file,), valid_files)
 
         if len(git_file.history) == 0:
-            logger.info("Remove file: {}".format(git_file.path))
-            git_files_data.remove((git_file, any_data))
+            logger.info("Remove file: %s", git_file.path)
             continue
 
-        _filter(draft_filter, any_data, git_history_file_extraction_func)
+        _filter(draft_filter, any_data, git_history_file_extraction_func, valid_files)
+        kept_git_files_data.append(git_file_data)
+
+    git_files_data[:] = kept_git_files_data
 
 
 def filter_subschemas(draft_filter: DraftFilter, git_files_data: [GitFile, [Subschema]]):
@@ -98,7 +123,7 @@ def filter_subschemas(draft_filter: DraftFilter, git_files_data: [GitFile, [Subs
         :param git_files_data: the pickled data from schema_drafts
         :return: None. git_files_data is manipulated directly.
         """
-    _default_filter(draft_filter, git_files_data, lambda subschema: [subschema.s1, subschema.s2])
+    _default_filter(draft_filter, git_files_data, lambda subschema: (subschema.s1, subschema.s2))
 
 
 def filter_schema_drafts(draft_filter: DraftFilter, git_files_data: [GitFile, [SchemaDrafts]]):
@@ -108,4 +133,4 @@ def filter_schema_drafts(draft_filter: DraftFilter, git_files_data: [GitFile, [S
     :param git_files_data: the pickled data from schema_drafts
     :return: None. git_files_data is manipulated directly.
     """
-    _default_filter(draft_filter, git_files_data, lambda schema_draft: schema_draft.git_history_file)
+    _default_filter(draft_filter, git_files_data, lambda schema_draft: (schema_draft.git_history_file,))
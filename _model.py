@@ -2,6 +2,7 @@
 Copyright (C) 2020  Michael Fruth
 """
 import logging
+import sys
 from os import path
 
 import _util as util
@@ -27,7 +28,7 @@ class ExecutionSettings:
 
     def set_multiprocessing_cores(self, value):
         self.multiprocessing_cores = value
-        if self.multiprocessing_cores is None or self.multiprocessing_cores < 0:
+        if self.multiprocessing_cores is None or self.multiprocessing_cores < 1:
             self.multiprocessing_cores = 1
 
     def set_self_check(self, value):
@@ -36,17 +37,69 @@ class ExecutionSettings:
             self.self_check = False
 
 
+class _Unset:
+    """
+    Marks a slot without value in the pickled state of a _SlotsObject.
+    """
+
+
+class _SlotsObject(object):
+    """
+    Base class of the classes which are pickled in large numbers. The attributes are stored in __slots__ instead of a
+    __dict__ and the state is pickled as tuple of the slot values (in the order of _pickled_slots).
+    Objects pickled before the __slots__ were introduced (with a dict as state) can still be unpickled.
+    """
+    __slots__ = ()
+
+    # The slots of the class and all its base classes. Set for each subclass.
+    _pickled_slots = ()
+
+    # The strings which are the same for many objects (e.g. the paths of the versions of a file). They are interned, so
+    # equal strings are stored only once in memory and in the pickled data. Set by the subclass.
+    _interned_slots = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._pickled_slots = tuple(
+            name for klass in reversed(cls.__mro__) for name in klass.__dict__.get('__slots__', ()))
+
+    def __getstate__(self):
+        return tuple(getattr(self, name, _Unset) for name in self._pickled_slots)
+
+    def __setstate__(self, state):
+        if isinstance(state, dict):
+            # Pickled before the __slots__ were introduced
+            items = state.items()
+        else:
+            items = zip(self._pickled_slots, state)
+        for name, value in items:
+            if value is not _Unset:
+                setattr(self, name, value)
+        self._intern_strings()
+
+    def _intern_strings(self):
+        for name in self._interned_slots:
+            value = getattr(self, name, None)
+            if isinstance(value, str):
+                setattr(self, name, sys.intern(value))
+
+
 #############################################################################
 # Start of classes that represent a file and all its versions
 #############################################################################
 
-class GitHistoryFile(object):
+class GitHistoryFile(_SlotsObject):
     """
     A GitHistoryFile is the version of a file. This class contains the SHA of the commit/respository, the old and new
     path (based on difference of the commit), the changed type (see git diff documentation for the different types)
     as well as the commit count (indicates the number of commits made to the repository in which the file resides).
     """
 
+    __slots__ = ('sha', 'old_path', 'new_path', 'change_type', 'commit_count', '_commit_directory', '_full_path',
+                 '_schema_tag')
+
+    _interned_slots = ('sha', 'old_path', 'new_path', 'change_type', '_commit_directory', '_schema_tag')
+
     def __init__(self, sha, old_path, new_path, change_type, commit_count):
         self.sha = sha
 
@@ -57,24 +110,66 @@ class GitHistoryFile(object):
 
         self.commit_count = commit_count
 
-    def schema_tag(self):
+        self._intern_strings()
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        if hasattr(self, '_commit_directory'):
+            # The full path can be computed again from the commit directory, so it's not pickled
+            state = tuple(_Unset if name == '_full_path' else value for name, value in zip(self._pickled_slots, state))
+        return state
+
+    def schema_tag(self, loads=False):
         """
         Loads the JSON Schema document and returns the specified schema tag ($schema).
+        :param loads: True if the document is known to load without an error (see util.schema_tag_from_file).
         :return:
         """
         if not hasattr(self, '_schema_tag'):
-            self._schema_tag = util.schema_tag(util.load_json(self.full_path)[1])
+            self.set_schema_tag(util.schema_tag_from_file(self.full_path, loads))
         return self._schema_tag
 
+    def set_schema_tag(self, schema_tag):
+        """
+        Sets the schema tag, if it was already loaded from the file (e.g. by another process).
+        :param schema_tag: The schema tag ($schema) of the file.
+        :return: None
+        """
+        # Many files have the same schema tag
+        self._schema_tag = sys.intern(schema_tag) if isinstance(schema_tag, str) else schema_tag
+
+    @property
+    def full_path(self):
+        """
+        The full path to the file. It is computed on the first access, based on the commit directory passed to
+        set_full_path.
+        :return: The full path to the file.
+        """
+        try:
+            return self._full_path
+        except AttributeError:
+            # Not computed yet. Raises an AttributeError if set_full_path wasn't called.
+            self._full_path = self._create_full_path(self._commit_directory)
+            return self._full_path
+
+    @full_path.setter
+    def full_path(self, full_path):
+        self._full_path = full_path
+
     def set_full_path(self, commit_directory):
         """
         Sets the full path to the file. E.g. commit_directory = /Users/.../JSStore/commits/
+        The full path itself is only computed when it is used (see full_path).
         :param commit_directory: The directory in which the file resides.
         :return:
         """
-        self.full_path = self._full_path(commit_directory)
+        self._commit_directory = sys.intern(commit_directory) if isinstance(commit_directory, str) else commit_directory
+        try:
+            del self._full_path
+        except AttributeError:
+            pass
 
-    def _full_path(self, commit_directory):
+    def _create_full_path(self, commit_directory):
         file_directory = util.commit_directory_name(self.commit_count, self.sha)
         file_path = self.new_path
         if not file_path:
@@ -94,7 +189,7 @@ class GitHistoryFile(object):
                 and self.old_path == other.old_path)
 
 
-class GitFile(object):
+class GitFile(_SlotsObject):
     """
     This class contains all versions of one specific file.
     The hierarchy is as follows:
@@ -106,12 +201,19 @@ class GitFile(object):
         ...
     """
 
+    __slots__ = ('path', 'added_sha', 'deleted_sha', 'history')
+
+    # The path is also the key of the file while the history is extracted (see git_file_changes)
+    _interned_slots = ('path', 'added_sha', 'deleted_sha')
+
     def __init__(self, file_path, added_sha):
         self.path = file_path
         self.added_sha = added_sha
         self.deleted_sha = None
         self.history: [GitHistoryFile] = []
 
+        self._intern_strings()
+
     def add_history(self, history_file: GitHistoryFile):
         self.history.append(history_file)
 
@@ -131,11 +233,13 @@ class GitFile(object):
 #############################################################################
 # Start of classes for specific analysis
 #############################################################################
-class SchemaDrafts:
+class SchemaDrafts(_SlotsObject):
     """
     Contains all information about the drafts of a JSON document.
     """
 
+    __slots__ = ('git_history_file', 'drafts')
+
     def __init__(self, git_history_file: GitHistoryFile):
         self.git_history_file: GitHistoryFile = git_history_file
 
@@ -147,13 +251,44 @@ class SchemaDrafts:
             raise ValueError("Key {} already exists".format(key))
         self.drafts[key] = drafts
 
+    def is_loaded(self):
+        """
+        Checks if the JSON document could be loaded. The drafts are only checked for loaded documents.
+        :return: True if the document was loaded, False otherwise.
+        """
+        return len(self.drafts) > 0
+
+    def _intern_strings(self):
+        # The keys, the drafts and the exception types are the same for many objects (the messages are not interned)
+        self.drafts = {
+            sys.intern(key): {sys.intern(draft): _intern_exception_type(none_or_ex) for draft, none_or_ex in
+                              drafts.items()}
+            for key, drafts in self.drafts.items()}
 
-class SubschemaComparison(object):
+
+def _intern_exception_type(exception):
+    """
+    Interns the type of the exception.
+    :param exception: None or a tuple of the type and the message of the exception.
+    :return: The exception with the interned type.
+    """
+    if isinstance(exception, tuple) and len(exception) > 0 and isinstance(exception[0], str):
+        return (sys.intern(exception[0]),) + exception[1:]
+    return exception
+
+
+class SubschemaComparison(_SlotsObject):
     """
     Contains all information about the containment check of two files. This is only a check of one! direction.
     E.g. a \subset b OR b \subset a
     """
 
+    __slots__ = ('is_subset', 'is_subset_exception', 'start_time', 'end_time', 'duration')
+
+    def _intern_strings(self):
+        # The exception types are the same for many comparisons
+        self.is_subset_exception = _intern_exception_type(self.is_subset_exception)
+
     def __init__(self, is_subset, is_subset_exception, start_time, end_time):
         self.is_subset = is_subset  # True = is subset; False = is not subset; None = failure
         self.is_subset_exception = is_subset_exception  # The exception if is_subset is None
@@ -163,11 +298,13 @@ class SubschemaComparison(object):
         self.duration = end_time - start_time
 
 
-class Subschema(object):
+class Subschema(_SlotsObject):
     """
     Contains all information about the containment check of two files.
     """
 
+    __slots__ = ('s1', 's2', 's1_compare_s2', 's2_compare_s1')
+
     def __init__(self, s1: GitHistoryFile, s2: GitHistoryFile):
         self.s1: GitHistoryFile = s1
         self.s2: GitHistoryFile = s2
@@ -176,6 +313,19 @@ class Subschema(object):
         self.s1_compare_s2: SubschemaComparison = None
         self.s2_compare_s1: SubschemaComparison = None
 
+    def _compare_both_directions(self, compare_func, concurrently=False):
+        """
+        Checks the containment in both directions with the given function and sets the results. If both files have the
+        same content, both directions are the same check, so the containment is only checked once (the compare
+        functions of subschema_util reuse the result of files with the same contents).
+        :param compare_func: The function to check the containment in one direction (e.g. python_jsonsubschema).
+        :param concurrently: If both directions should be checked at the same time (see
+        subschema_util.compare_both_directions).
+        :return: None.
+        """
+        self.s1_compare_s2, self.s2_compare_s1 = subschema_util.compare_both_directions(
+            compare_func, self.s1.full_path, self.s2.full_path, concurrently=concurrently)
+
     def __str__(self):
         return "#" * 10 + " SUBSCHEMA " + "#" * 10 + "\n" + \
                "File 1: {}\nFile 2: {}\n" \
@@ -196,11 +346,13 @@ class _NpmJsonSchemaDiffValidator(Subschema):
     https://www.npmjs.com/package/json-schema-diff-validator
     """
 
+    __slots__ = ()
+
     def __init__(self, s1: GitHistoryFile, s2: GitHistoryFile):
         super().__init__(s1, s2)
 
-        self.s1_compare_s2 = subschema_util.npm_json_schema_diff_validator(s1.full_path, s2.full_path)
-        self.s2_compare_s1 = subschema_util.npm_json_schema_diff_validator(s2.full_path, s1.full_path)
+        # The check is done by node processes, so both directions can be checked at the same time
+        self._compare_both_directions(subschema_util.npm_json_schema_diff_validator, concurrently=True)
 
 
 class _NpmIsJsconSchemaSubsetSubschema(Subschema):
@@ -209,11 +361,13 @@ class _NpmIsJsconSchemaSubsetSubschema(Subschema):
     https://www.npmjs.com/package/is-json-schema-subset
     """
 
+    __slots__ = ()
+
     def __init__(self, s1: GitHistoryFile, s2: GitHistoryFile):
         super().__init__(s1, s2)
 
-        self.s1_compare_s2 = subschema_util.npm_is_json_schema_subset(s1.full_path, s2.full_path)
-        self.s2_compare_s1 = subschema_util.npm_is_json_schema_subset(s2.full_path, s1.full_path)
+        # The check is done by node processes, so both directions can be checked at the same time
+        self._compare_both_directions(subschema_util.npm_is_json_schema_subset, concurrently=True)
 
 
 class _PythonJsonsubschemaSubschema(Subschema):
@@ -222,11 +376,12 @@ class _PythonJsonsubschemaSubschema(Subschema):
     https://github.com/IBM/jsonsubschema
     """
 
+    __slots__ = ()
+
     def __init__(self, s1: GitHistoryFile, s2: GitHistoryFile):
         super().__init__(s1, s2)
 
-        self.s1_compare_s2 = subschema_util.python_jsonsubschema(s1.full_path, s2.full_path)
-        self.s2_compare_s1 = subschema_util.python_jsonsubschema(s2.full_path, s1.full_path)
+        self._compare_both_directions(subschema_util.python_jsonsubschema)
 
 
 #############################################################################
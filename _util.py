@@ -2,20 +2,55 @@
 Helper functions.
 @author: Michael Fruth
 """
+import functools
+import hashlib
 import json
 import logging
-import multiprocessing
+import mmap
 import pickle
+import re
 from os import path
 
-import chardet
+try:
+    # Optional: C-implementation of chardet to speed up the detection of the encoding
+    import cchardet as chardet
+except ImportError:
+    import chardet
 from jsonschema import Draft3Validator, Draft4Validator, Draft6Validator, Draft7Validator
+from jsonschema.exceptions import SchemaError
+
+try:
+    # Optional: Rust-based validation to speed up the validation of valid schemas
+    import jsonschema_rs
+except ImportError:
+    jsonschema_rs = None
+
+try:
+    # Optional: Faster parsing of the json files
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    # Optional: Faster hashing of the file contents
+    import xxhash
+except ImportError:
+    xxhash = None
+
+try:
+    # Optional: Compression of the pickled filters
+    import zstandard
+except ImportError:
+    zstandard = None
 
 logger = logging.getLogger(__name__)
 
 # Separator used to separate the commit-count and the SHA of the repository in the directory-name.
 _COMMIT_HISTORY_DIRECTORY_SPEARATOR = "#"
 
+# Number of bytes at the beginning of a file which are used to determine the encoding of the file.
+_ENCODING_DETECTION_SIZE = 64 * 1024
+
 DRAFT3_NAME = 'Draft3'
 DRAFT4_NAME = 'Draft4'
 DRAFT6_NAME = 'Draft6'
@@ -28,6 +63,32 @@ SCHEMA_VALIDATORS = {
     DRAFT7_NAME: Draft7Validator
 }
 
+# The validators for the meta-schemas of the drafts. They are created once instead of on each check of a schema.
+_META_SCHEMA_VALIDATORS = {draft: validator(validator.META_SCHEMA) for draft, validator in SCHEMA_VALIDATORS.items()}
+
+
+def _create_fast_meta_schema_validators():
+    """
+    Creates the validators of jsonschema_rs for the meta-schemas of the drafts, if jsonschema_rs is available.
+    Drafts which are not supported by jsonschema_rs (e.g. Draft 3) are skipped.
+    :return: A dictionary with the draft as key and the validator of jsonschema_rs as value.
+    """
+    if jsonschema_rs is None:
+        return {}
+
+    # Newer versions of jsonschema_rs replaced JSONSchema by validator_for
+    create_validator = getattr(jsonschema_rs, 'validator_for', None) or jsonschema_rs.JSONSchema
+    fast_validators = {}
+    for draft, validator in SCHEMA_VALIDATORS.items():
+        try:
+            fast_validators[draft] = create_validator(validator.META_SCHEMA)
+        except Exception:
+            logger.info("Draft %s is not supported by jsonschema_rs" % draft)
+    return fast_validators
+
+
+_FAST_META_SCHEMA_VALIDATORS = _create_fast_meta_schema_validators()
+
 
 def commit_directory_name(commit_count, sha):
     return str(commit_count) + _COMMIT_HISTORY_DIRECTORY_SPEARATOR + str(sha)
@@ -42,7 +103,8 @@ def info_from_commit_directory_name(directory_name_or_path: str):
 def load_json(json_file):
     """
     Loads the given json file while considering different encodings. First, UTF-8 will be tried. If this doesn't work,
-    the encoding will be determined ba the module chardet and it is tried again to load the json file.
+    the encoding will be determined ba the module chardet (based on the first 64 KB of the file) and it is tried again
+    to load the json file.
     :param json_file: The json file to load
     :return: Plain content of the file (str), the loaded json content (dict), the encoding and a flag which indicates
     if a error occured.
@@ -54,8 +116,9 @@ def load_json(json_file):
         content, json_content = _load_json_with_enconding(json_file, encoding)
     except (json.JSONDecodeError, UnicodeDecodeError):
         # File has probably other charset - determine charset and try again
+        # Only the beginning of the file is used to determine the charset, which is enough for (nearly) all files
         with open(json_file, 'rb') as f:
-            content = f.read()
+            content = f.read(_ENCODING_DETECTION_SIZE)
             encoding = chardet.detect(content)['encoding']
         try:
             content, json_content = _load_json_with_enconding(json_file, encoding)
@@ -64,13 +127,60 @@ def load_json(json_file):
     return content, json_content, encoding, error
 
 
+@functools.lru_cache(maxsize=4096)
+def load_json_cached(json_file):
+    """
+    Same as load_json, but the result is cached per path for the lifetime of the process. Each worker of a
+    multiprocessing pool has its own cache.
+    The loaded json content is shared between all callers and must not be modified.
+    :param json_file: The json file to load
+    :return: See load_json.
+    """
+    return load_json(json_file)
+
+
+@functools.lru_cache(maxsize=4096)
+def content_hash(file):
+    """
+    Computes the hash of the content of the file: XXH3 (128 bit) if xxhash is available, otherwise SHA-256. The hash is
+    only used to find files with the same content in one process, so both hashes can be used. The hash is cached per path
+    for the lifetime of the process.
+    The file is memory-mapped, so its content is hashed without copying it into memory first.
+    :param file: The file to hash.
+    :return: The hex digest of the hash.
+    """
+    hash_func = xxhash.xxh3_128 if xxhash is not None else hashlib.sha256
+    with open(file, 'rb') as f:
+        if path.getsize(file) == 0:
+            # Empty files can't be memory-mapped
+            return hash_func(b'').hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped_file:
+            return hash_func(mapped_file).hexdigest()
+
+
 def _load_json_with_enconding(file, encoding):
     with open(file, 'r', encoding=encoding) as f:
         content = f.read()
-        json_content = json.loads(content)
+        json_content = _json_loads(content)
         return content, json_content
 
 
+def _json_loads(content):
+    """
+    Parses the json string with orjson if it is available, otherwise with json.
+    orjson is stricter than json (e.g. NaN or integers larger than 64 bit are not supported), so json is used if orjson
+    fails. This way, the same files can be loaded with and without orjson.
+    :param content: The json string.
+    :return: The loaded json content.
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(content)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(content)
+
+
 def schema_validate_all_drafts(json_content):
     """
     Validate the json based on all drafts (Draft 3, 4, 6, 7).
@@ -81,16 +191,56 @@ def schema_validate_all_drafts(json_content):
      the second value is the string-representation of the excepetion (error message).
     """
     result = {}
-    for draft, validator in SCHEMA_VALIDATORS.items():
+    for draft in SCHEMA_VALIDATORS:
         try:
             # Validator throws an excepetion if its invalid; Otherwise nothing happens.
-            validator.check_schema(json_content)
+            check_schema(draft, json_content)
             result[draft] = None
         except Exception as e:
             result[draft] = (str(type(e)), str(e))
     return result
 
 
+# The results of schema_validate_all_drafts_of_file by the content hash of the file
+_validations_by_content_hash = {}
+
+
+def schema_validate_all_drafts_of_file(json_file):
+    """
+    Loads the json file (see load_json_cached) and validates it based on all drafts (see schema_validate_all_drafts).
+    The result is reused for files with the same content and must not be modified.
+    :param json_file: The json file to validate.
+    :return: See schema_validate_all_drafts.
+    """
+    key = content_hash(json_file)
+    if key not in _validations_by_content_hash:
+        _validations_by_content_hash[key] = schema_validate_all_drafts(load_json_cached(json_file)[1])
+    return _validations_by_content_hash[key]
+
+
+def check_schema(draft, json_content):
+    """
+    Validates the json against the meta-schema of the draft. This is the same as <Validator>.check_schema(), but the
+    validator of the meta-schema is reused.
+    If jsonschema_rs is available, it is used to check if the json is valid. The error of an invalid json is always
+    created by jsonschema, so the error is the same with and without jsonschema_rs.
+    :param draft: The name of the draft (e.g. DRAFT4_NAME).
+    :param json_content: The json to validate.
+    :return: None. A SchemaError is raised if the json is invalid.
+    """
+    fast_validator = _FAST_META_SCHEMA_VALIDATORS.get(draft)
+    if fast_validator is not None:
+        try:
+            if fast_validator.is_valid(json_content):
+                return
+        except Exception:
+            # jsonschema_rs can't handle the json (e.g. a dereferenced json containing recursive references)
+            pass
+
+    for error in _META_SCHEMA_VALIDATORS[draft].iter_errors(json_content):
+        raise SchemaError.create_from(error)
+
+
 def schema_tag(json_content):
     """
     Gets the schema tag ($schema) out of the json.
@@ -102,57 +252,245 @@ def schema_tag(json_content):
     return None
 
 
+# The $schema as first entry of the json (the usual position), optionally preceded by an UTF-8 BOM.
+# Values with escape sequences are not matched, because they must be decoded by the json parser.
+_SCHEMA_TAG_PATTERN = re.compile(rb'^(?:\xef\xbb\xbf)?\s*\{\s*"\$schema"\s*:\s*"([^"\\]*)"')
+
+# Number of bytes at the beginning of a file in which the $schema is searched by schema_tag_from_file.
+_SCHEMA_TAG_SEARCH_SIZE = 4096
+
+
+def schema_tag_from_file(json_file, loads=False):
+    """
+    Gets the schema tag ($schema) out of the json file. If the file is known to load (e.g. its drafts were checked by
+    schema_drafts) and the $schema is the first entry of the json, it is read from the beginning of the file without
+    loading the whole json. Otherwise, the json is loaded (see load_json_cached).
+    :param json_file: The json file.
+    :param loads: True if the json file is known to load without an error.
+    :return: The schema tag or None if the json doesn't contain a schema tag or can't be loaded.
+    """
+    if loads:
+        with open(json_file, 'rb') as f:
+            head = f.read(_SCHEMA_TAG_SEARCH_SIZE)
+        match = _SCHEMA_TAG_PATTERN.match(head)
+        if match is not None:
+            try:
+                return match.group(1).decode('utf-8')
+            except UnicodeDecodeError:
+                pass
+
+    content, json_content, encoding, error = load_json_cached(json_file)
+    if error:
+        return None
+    return schema_tag(json_content)
+
+
 def append_pickle(file, data):
     """
     Pickle data on the same file multiple times and the data is appended each time instead of overwriting the old data.
-    The file will be first unpickled, data will be appendend and the file will be pickled again.
+    Each call appends one record to the end of the file, so the old data doesn't need to be read and written again.
+    Use load_pickle_records() to read the records.
     :param file: The file which stores the data.
     :param data: The data to store.
     :return: None.
     """
-    logger.info("Read old data %s" % file)
-    if path.isfile(file):
-        # Read old data
-        with open(file, 'rb') as f:
-            pickle_data = pickle.load(f)
-    else:
-        # File doesn't exists
-        pickle_data = []
+    logger.info("Append new data %s" % file)
+    with open(file, 'ab') as f:
+        pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def append_pickle_records(file, records, exclusive=False):
+    """
+    Same as append_pickle for each record, but the file is opened only once. The records can be computed while they are
+    appended (e.g. a generator). Each record is written to the file as soon as it is pickled, so the records stored
+    until an error occurs are kept.
+    :param file: The file which stores the data.
+    :param records: The records to store.
+    :param exclusive: If the file must not exist yet. It is created exclusively (no records are computed otherwise).
+    :return: None.
+    :raises FileExistsError: If exclusive is set and the file already exists.
+    """
+    with open(file, 'xb' if exclusive else 'ab') as f:
+        for record in records:
+            logger.info("Append new data %s" % file)
+            pickle.dump(record, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
 
-    logger.info("Write new data %s" % file)
-    with open(file, 'wb') as f:
-        # Append data and pickle
-        pickle_data.append(data)
-        pickle.dump(pickle_data, f)
+
+# The magic number at the beginning of zstandard-compressed data. Pickled data never starts with it.
+_ZSTANDARD_MAGIC_NUMBER = b'\x28\xb5\x2f\xfd'
+
+
+def dump_pickle(file, data, compress=False, exclusive=False):
+    """
+    Pickles the data into the file (the file is overwritten). Use loads_pickle() to load the data.
+    :param file: The file which stores the data.
+    :param data: The data to store.
+    :param compress: If the pickled data should be compressed with zstandard (must be installed).
+    :param exclusive: If the file must not exist yet. It is created exclusively instead of being overwritten.
+    :return: None.
+    :raises FileExistsError: If exclusive is set and the file already exists.
+    """
+    pickled_data = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+    if compress:
+        if zstandard is None:
+            raise ImportError("zstandard must be installed to compress the data")
+        pickled_data = zstandard.ZstdCompressor().compress(pickled_data)
+    with open(file, 'xb' if exclusive else 'wb') as f:
+        f.write(pickled_data)
+
+
+def loads_pickle(buffer):
+    """
+    Unpickles the data stored by dump_pickle(). Compressed data is decompressed first.
+    :param buffer: The content of the file (e.g. bytes or a memory-mapped file).
+    :return: The unpickled data.
+    """
+    if buffer[:len(_ZSTANDARD_MAGIC_NUMBER)] == _ZSTANDARD_MAGIC_NUMBER:
+        if zstandard is None:
+            raise ImportError("zstandard must be installed to load compressed data")
+        buffer = zstandard.ZstdDecompressor().decompress(buffer)
+    return pickle.loads(buffer)
+
+
+def load_pickle_file(file):
+    """
+    Loads the data stored by dump_pickle() (compressed or not). The file is memory-mapped and unpickled at once instead of
+    reading it piece by piece.
+    :param file: The file which stores the data.
+    :return: The unpickled data.
+    """
+    with open(file, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped_file:
+        return loads_pickle(mapped_file)
+
+
+def load_pickle_records(file):
+    """
+    Generator-implementation to load the records stored by append_pickle() one after another.
+    Files created by an older version of append_pickle() contain one pickled list with all records. The items of this
+    list are yielded as records.
+    :param file: The file which stores the data.
+    :return: A generator yielding the records of the file.
+    """
+    with open(file, 'rb') as f:
+        is_first_record = True
+        while True:
+            try:
+                record = pickle.load(f)
+            except EOFError:
+                # All records are loaded
+                return
+
+            if is_first_record and isinstance(record, list):
+                # Old format: A single list containing all records
+                yield from record
+            else:
+                yield record
+            is_first_record = False
 
 
 def find_in_json_recursive(dictionary, lookup_key, yield_parent=False, _parent=None):
     """
     Generator-implementation to find a specific entry (lookup_key) in a json dictionary. The lookup_key must be a
-    dictionary-entry. This method can throw an RecursionError.
+    dictionary-entry. The json is traversed with an explicit stack (depth-first, in the order of the json) instead of
+    recursive calls, so the depth of the json is not limited by the recursion limit. Cyclic jsons (e.g. dereferenced
+    recursive references) are supported: a dictionary is not searched again inside of itself.
     :param dictionary: The dictionary to search for the lookup_key.
     :param lookup_key: The key which should be contained in the dictionary.
     :param yield_parent: If the parent or the element which contains the key should be yielded.
-    :param _parent: The current parent element (do not set this from outside! Internal use only.
+    :param _parent: The parent of the dictionary (do not set this from outside! Internal use only.
     :return: A list with all elements containing the lookup_key. (Empty list if no key matching the lookup_key was found)
     """
     if not isinstance(dictionary, dict):
         return
 
-    for key, value in dictionary.items():
-        if key == lookup_key:
-            if yield_parent:
-                # Yield parent if parent is set - otherwise yield the dictionary
-                yield _parent
-            else:
-                yield dictionary
-        elif isinstance(value, dict):
-            for result in find_in_json_recursive(value, lookup_key, yield_parent=yield_parent, _parent=key):
-                yield result
-        elif isinstance(value, list):
-            for item in value:
-                for result in find_in_json_recursive(item, lookup_key, yield_parent=yield_parent, _parent=key):
-                    yield result
+    # Each entry is a dictionary, its parent and the iterator over the (remaining) items of the dictionary.
+    stack = [(dictionary, _parent, iter(dictionary.items()))]
+    # The ids of the dictionaries on the path to the current dictionary (including itself), see _push_json_children
+    path_ids = set()
+    while stack:
+        current, parent, items = stack[-1]
+        path_ids.add(id(current))
+
+        for key, value in items:
+            if key == lookup_key:
+                if yield_parent:
+                    # Yield parent if parent is set - otherwise yield the dictionary
+                    yield parent
+                else:
+                    yield current
+            elif _push_json_children(stack, path_ids, value, key):
+                break
+        else:
+            # All items of the current dictionary are processed
+            stack.pop()
+            path_ids.discard(id(current))
+
+
+def find_keywords_in_json(dictionary, lookup_keys):
+    """
+    Generator-implementation to find multiple entries (lookup_keys) in a json dictionary in one traversal. The result
+    for each key is the same as find_in_json_recursive(dictionary, key, yield_parent=True), e.g. the content of an entry
+    is not searched for the same key again.
+    :param dictionary: The dictionary to search for the lookup_keys.
+    :param lookup_keys: The keys (a set) which should be contained in the dictionary.
+    :return: Tuples (key, parent) for all found keys. The parent is the key of the element which contains the key (None
+    for the dictionary itself).
+    """
+    if not isinstance(dictionary, dict):
+        return
+
+    # Each entry is a dictionary, its parent, the iterator over the (remaining) items of the dictionary and the keys
+    # found on the path to the dictionary (these keys are not searched in the dictionary).
+    stack = [(dictionary, None, iter(dictionary.items()), frozenset())]
+    # The ids of the dictionaries on the path to the current dictionary (including itself), see _push_json_children
+    path_ids = set()
+    while stack:
+        current, parent, items, found_keys = stack[-1]
+        path_ids.add(id(current))
+
+        for key, value in items:
+            child_found_keys = found_keys
+            if key in lookup_keys and key not in found_keys:
+                yield key, parent
+                child_found_keys = found_keys | {key}
+            if child_found_keys >= lookup_keys:
+                # All keys are found on this path - nothing to search in the value
+                continue
+
+            if _push_json_children(stack, path_ids, value, key, (child_found_keys,)):
+                break
+        else:
+            # All items of the current dictionary are processed
+            stack.pop()
+            path_ids.discard(id(current))
+
+
+def _push_json_children(stack, path_ids, value, parent, entry_end=()):
+    """
+    Pushes the dictionaries of the value (the value itself or the dictionaries in a list) which are not on the current
+    path onto the stack of find_in_json_recursive/find_keywords_in_json. A dictionary on the current path contains
+    itself (cyclic json), so it's not searched again. The ids of the path are added when a dictionary is processed and
+    removed when all its items are processed.
+    :param stack: The stack.
+    :param path_ids: The ids of the dictionaries on the current path.
+    :param value: The value of a dictionary entry.
+    :param parent: The parent of the dictionaries (the key of the value).
+    :param entry_end: The values of a stack entry after the iterator over the items of the dictionary.
+    :return: True if something was pushed onto the stack, false otherwise.
+    """
+    if isinstance(value, dict):
+        children = (value,)
+    elif isinstance(value, list):
+        # Reversed, so the first item of the list is processed first
+        children = reversed(value)
+    else:
+        return False
+
+    stack_size = len(stack)
+    stack.extend((child, parent, iter(child.items())) + entry_end
+                 for child in children if isinstance(child, dict) and id(child) not in path_ids)
+    return len(stack) > stack_size
 
 
 def multiprocess_and_set_files_later(cores, func, iterable, reset_func, use_map=False):
@@ -160,9 +498,9 @@ def multiprocess_and_set_files_later(cores, func, iterable, reset_func, use_map=
     This method is used to compute something in parallel. A processing pool is opened with the specified number of cores
     and executes "func" on each item of "iterable. The "reset_func" is used when the computation is done.
 
-    Reminder: This is multi-processing and not multi-threading! For each function call, a new process will be opened and
-    the passed data is pickled and passed to the function. When execution is done, the data will be pickled again to
-    return it back to the main process. This can lead to unwanted behavior!
+    Reminder: This is multi-processing and not multi-threading! The items are passed once to each process of the pool
+    (the data is pickled or copied) and the processes receive only the indices of the items to compute. When execution is
+    done, the result will be pickled to return it back to the main process. This can lead to unwanted behavior!
     E.g.
     Outside                         Multiprocessing-Process
     1. Create object a
@@ -185,20 +523,55 @@ def multiprocess_and_set_files_later(cores, func, iterable, reset_func, use_map=
     :return: The results (as lsit) of the "func".
     """
     logger.info("Starting multiproccessing... Using {} cores for {} items:".format(cores, len(iterable)))
-    with multiprocessing.Pool(processes=cores) as pool:
-        if use_map:
-            result = pool.map(func, iterable)
-        else:
-            result = pool.starmap(func, iterable)
+    import multiprocessing  # Imported only when needed to speed up the startup of scripts that don't use it
+    # Send the indices in chunks to the processes to reduce the communication overhead, but keep the chunks small enough
+    # to distribute the work evenly
+    chunksize = max(1, len(iterable) // (cores * 4))
+
+    # All items have the same type, so it's decided once whether the items are unpacked to call the reset_func.
+    unpack_items = len(iterable) > 0 and isinstance(iterable[0], (tuple, list))
+
+    result = [None] * len(iterable)
+    # The function and the items are passed once to each process, afterwards only the indices of the items are sent.
+    with multiprocessing.Pool(processes=cores, initializer=_init_worker, initargs=(func, use_map, iterable)) as pool:
+        # The results are processed as soon as they are available and put back in the order of the iterable.
+        for i, item_result in pool.imap_unordered(_execute_index, range(len(iterable)), chunksize=chunksize):
+            result[i] = item_result
+            if unpack_items:
+                reset_func(*iterable[i], item_result)
+            else:
+                reset_func(iterable[i], item_result)
 
-    if len(iterable) != len(result):
-        raise ValueError(
-            "Length of iterables () doesn't match the length of the result ({})".format(len(iterable), len(result)))
+    return result
 
-    for i in range(len(iterable)):
-        if isinstance(iterable[i], tuple) or isinstance(iterable[i], list):
-            reset_func(*iterable[i], result[i])
-        else:
-            reset_func(iterable[i], result[i])
 
-    return result
+# The function and the items of multiprocess_and_set_files_later. Only set in the processes of the pool.
+_worker_func = None
+_worker_use_map = None
+_worker_items = None
+
+
+def _init_worker(func, use_map, items):
+    """
+    Initializes a process of the pool of multiprocess_and_set_files_later.
+    :param func: The function to execute.
+    :param use_map: If true, the item is passed as the only argument, otherwise the item is unpacked (like "star_map").
+    :param items: The items on which the "func" should be executed.
+    :return: None.
+    """
+    global _worker_func, _worker_use_map, _worker_items
+    _worker_func = func
+    _worker_use_map = use_map
+    _worker_items = items
+
+
+def _execute_index(index):
+    """
+    Executes the function on the item with the given index. Used by the processes of multiprocess_and_set_files_later.
+    :param index: The index of the item.
+    :return: The index of the item and the result of the function.
+    """
+    item = _worker_items[index]
+    if _worker_use_map:
+        return index, _worker_func(item)
+    return index, _worker_func(*item)
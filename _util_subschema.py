@@ -2,9 +2,13 @@
 Helper functions for the schema containment check.
 @author: Michael Fruth
 """
+import json
 import logging
+import os
 import subprocess
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from os import path
 
 import jsonsubschema
@@ -19,6 +23,142 @@ SYM_SUPERSET = '⊃'
 SYM_FAIL = '⟂'
 SYM_NOTHING = '∥'
 
+# All symbols (in the order of the outputs)
+SYMBOLS = (SYM_EQUAL, SYM_SUBSET, SYM_SUPERSET, SYM_FAIL, SYM_NOTHING)
+
+# The symbol for the decisions of both directions (S1 \sub S2, S2 \sub S1), if none of them failed
+_SYMBOLS_BY_DECISIONS = {
+    (True, True): SYM_EQUAL,  # S1 \sub S2 and S2 \sub S1 -> EQUAL
+    (True, False): SYM_SUBSET,  # S1 \sub S2 and S2 \nothing S1 -> SUBSET
+    (False, True): SYM_SUPERSET,  # S1 \nothing S2 and S2 \sub S1 -> SUPERSET
+    (False, False): SYM_NOTHING  # S1 \nothing S2 and S2 \nothing S1 -> NOTHING
+}
+
+_SYMBOL_NAMES = {
+    SYM_EQUAL: "Equal " + SYM_EQUAL,
+    SYM_SUBSET: "Subschema " + SYM_SUBSET,
+    SYM_SUPERSET: "Superschema " + SYM_SUPERSET,
+    SYM_FAIL: "Fail " + SYM_FAIL,
+    SYM_NOTHING: "Nothing " + SYM_NOTHING
+}
+
+
+class _NpmWorker:
+    """
+    A long-lived node process (server.js) of a npm tool. Instead of starting a new node process for each containment
+    check, the paths of the files to check are sent line by line to the process. The process prints the same output as
+    cli.js for each check, followed by a line containing END_OF_OUTPUT.
+
+    A node process belongs to the python process and thread which started it. If call() is executed by another process
+    (e.g. a forked multiprocessing-process) or thread, a new node process is started for this process or thread.
+    The node process stops on its own when the stdin is closed (e.g. when the python process exits).
+    """
+    END_OF_OUTPUT = b'---END---'
+
+    def __init__(self, npm_directory):
+        self.npm_path = path.abspath(path.join(path.dirname(path.realpath(__file__)), npm_directory))
+        # The node process and the pid of the python process which started it, per thread
+        self._local = threading.local()
+
+    def _start(self):
+        self._local.process = subprocess.Popen(['node', '-r', 'esm', 'server.js'], stdin=subprocess.PIPE,
+                                               stdout=subprocess.PIPE, cwd=self.npm_path)
+        self._local.pid = os.getpid()
+        return self._local.process
+
+    def call(self, path1, path2):
+        """
+        Executes the containment check of the tool for the given files.
+        :param path1: Path to the first file.
+        :param path2: Path to the second file.
+        :return: A CompletedProcess containing the output of the check as stdout (like subprocess.run).
+        :raises RuntimeError: If the node process stopped before the output of the check was complete. The process is
+        restarted for the following calls.
+        """
+        process = getattr(self._local, 'process', None)
+        if process is None or self._local.pid != os.getpid() or process.poll() is not None:
+            process = self._start()
+
+        request = json.dumps({'path1': path1, 'path2': path2}) + '\n'
+        process.stdin.write(request.encode('utf-8'))
+        process.stdin.flush()
+
+        lines = []
+        while True:
+            line = process.stdout.readline()
+            if not line:
+                # The process died without ending the output - restart it, so the following checks can be executed.
+                returncode = process.wait()
+                self._start()
+                raise RuntimeError("Node process of %s stopped unexpectedly (exit code %s) while checking %s and %s" % (
+                    self.npm_path, returncode, path1, path2))
+            if line.rstrip(b'\r\n') == self.END_OF_OUTPUT:
+                break
+            lines.append(line)
+
+        return subprocess.CompletedProcess(process.args, process.poll(), stdout=b''.join(lines))
+
+
+_npm_json_schema_diff_validator_worker = _NpmWorker('tools/npm-json-schema-diff-validator')
+_npm_is_json_schema_subset_worker = _NpmWorker('tools/npm-is-json-schema-subset')
+
+
+# Thread used to check the second direction of a containment check concurrently. Created per process (see
+# compare_both_directions).
+_background_executor = None
+_background_executor_pid = None
+
+
+def compare_both_directions(compare_func, path1, path2, concurrently=False):
+    """
+    Checks the containment of the files in both directions with the given function.
+    If concurrently is set, the second direction is checked in another thread at the same time. This is only useful for
+    functions which wait for another process (e.g. the npm tools), because of the GIL. Files with the same contents are
+    always checked one after another, so the second direction reuses the result of the first one.
+    If the directions are checked one after another (e.g. jsonsubschema) and the first check failed to load the files
+    (see _is_load_error), the second direction is not checked; it gets the exception of the first direction (with a
+    duration of 0, like a reused result). The concurrent checks (the npm tools) always check both directions.
+    :param compare_func: The function to check the containment in one direction (e.g. npm_is_json_schema_subset).
+    :param path1: Path to the first file.
+    :param path2: Path to the second file.
+    :param concurrently: If both directions should be checked at the same time.
+    :return: The SubschemaComparison of path1 \sub path2 and the SubschemaComparison of path2 \sub path1.
+    """
+    if not concurrently or util.content_hash(path1) == util.content_hash(path2):
+        s1_compare_s2 = compare_func(path1, path2)
+        if _is_load_error(s1_compare_s2):
+            # The other direction loads the same files, so it fails in the same way - skip it
+            logger.info("Skip compare S2 %s sub S1 %s - loading failed" % (path2, path1))
+            return s1_compare_s2, _unchecked_comparison(s1_compare_s2)
+        return s1_compare_s2, compare_func(path2, path1)
+
+    global _background_executor, _background_executor_pid
+    if _background_executor is None or _background_executor_pid != os.getpid():
+        # Threads are not copied to forked processes, so each process needs its own executor. The thread is kept, so
+        # its node processes are reused for the following checks.
+        _background_executor = ThreadPoolExecutor(max_workers=1)
+        _background_executor_pid = os.getpid()
+
+    s2_compare_s1 = _background_executor.submit(compare_func, path2, path1)
+    s1_compare_s2 = compare_func(path1, path2)
+    return s1_compare_s2, s2_compare_s1.result()
+
+
+# Types of exceptions (jsonsubschema: type of the exception) which only occur while loading the files, i.e. a reference
+# which can't be resolved. Other types (e.g. a SyntaxError of an invalid pattern) can occur while checking, too.
+_LOAD_ERROR_TYPES = {"<class 'jsonref.JsonRefError'>"}
+
+
+def _is_load_error(comparison):
+    """
+    Checks if the containment check failed because the files couldn't be loaded.
+    :param comparison: The SubschemaComparison of the check.
+    :return: True if loading the files failed, False otherwise.
+    """
+    if comparison.is_subset is not None or comparison.is_subset_exception is None:
+        return False
+    return comparison.is_subset_exception[0] in _LOAD_ERROR_TYPES
+
 
 def create_symbol_map(func):
     """
@@ -26,51 +166,79 @@ def create_symbol_map(func):
     :param func: The function which returns the initial value of the keys of the dictionary.
     :return: A dictionary.
     """
-    return {
-        SYM_EQUAL: func(),
-        SYM_SUBSET: func(),
-        SYM_SUPERSET: func(),
-        SYM_FAIL: func(),
-        SYM_NOTHING: func()
-    }
+    return {symbol: func() for symbol in SYMBOLS}
 
 
 def get_name_for_symbol(symbol):
-    if symbol == SYM_EQUAL:
-        return "Equal " + symbol
-    elif symbol == SYM_SUBSET:
-        return "Subschema " + symbol
-    elif symbol == SYM_SUPERSET:
-        return "Superschema " + symbol
-    elif symbol == SYM_FAIL:
-        return "Fail " + symbol
-    elif symbol == SYM_NOTHING:
-        return "Nothing " + symbol
-    else:
+    try:
+        return _SYMBOL_NAMES[symbol]
+    except KeyError:
         raise ValueError("Unrecognized symbol {}".format(symbol))
 
 
 def get_symbol(subschema):
-    if subschema.s1_compare_s2.is_subset is True and subschema.s2_compare_s1.is_subset is True:
-        # S1 \sub S2 and S2 \sub S1 -> EQUAL
-        return SYM_EQUAL
-    if subschema.s1_compare_s2.is_subset is None or subschema.s2_compare_s1.is_subset is None:
+    s1_sub_s2 = subschema.s1_compare_s2.is_subset
+    s2_sub_s1 = subschema.s2_compare_s1.is_subset
+    if s1_sub_s2 is None or s2_sub_s1 is None:
         # S1 \fail S2 or S2 \fail S1 -> FAILURE
         return SYM_FAIL
-    if subschema.s1_compare_s2.is_subset is True and subschema.s2_compare_s1.is_subset is False:
-        # S1 \sub S2 and S2 \nothing S1 -> SUBSET
-        return SYM_SUBSET
-    if subschema.s1_compare_s2.is_subset is False and subschema.s2_compare_s1.is_subset is True:
-        # S1 \nothing S2 and S2 \sub S1 -> SUPERSET
-        return SYM_SUPERSET
-    if subschema.s1_compare_s2.is_subset is False and subschema.s2_compare_s1.is_subset is False:
-        # S1 \nothing S2 and S2 \nothing S1 -> NOTHING
-        return SYM_NOTHING
 
-    raise ValueError("This should not happen...\n{}".format(subschema))
+    symbol = _SYMBOLS_BY_DECISIONS.get((s1_sub_s2, s2_sub_s1))
+    if symbol is None:
+        raise ValueError("This should not happen...\n{}".format(subschema))
+    return symbol
+
+
+# The results of the containment checks of this process. Key: (tool, content hash of file 1, content hash of file 2)
+_comparison_cache = {}
+
+
+def _cached_comparison(tool, compare_func, path1, path2):
+    """
+    Returns the result of the containment check path1 \sub path2 of the tool. If the tool already checked two files with
+    the same contents, the result of this check is reused with a duration of 0 instead of executing the tool again.
+    Note that files referenced by the files (e.g. relative references) are not part of the content hash.
+    :param tool: The name of the tool.
+    :param compare_func: The function executing the containment check of the tool.
+    :param path1: Path to the first file.
+    :param path2: Path to the second file.
+    :return: SubschemaComparison containing the information of the containment check.
+    """
+    key = (tool, util.content_hash(path1), util.content_hash(path2))
+    comparison = _comparison_cache.get(key)
+    if comparison is None:
+        comparison = compare_func(path1, path2)
+        _comparison_cache[key] = comparison
+        return comparison
+
+    logger.info("Reuse result of %s for S1 %s sub S2 %s (same contents)" % (tool, path1, path2))
+    return _unchecked_comparison(comparison)
+
+
+def _unchecked_comparison(comparison):
+    """
+    Creates the result of a containment check which wasn't executed, because the result is known from another check.
+    :param comparison: The SubschemaComparison of the executed check.
+    :return: A new SubschemaComparison with the decision and the exception of the executed check and a duration of 0,
+    so only executed checks are counted in the duration statistics.
+    """
+    from _model import SubschemaComparison
+    return SubschemaComparison(comparison.is_subset, comparison.is_subset_exception, comparison.end_time,
+                               comparison.end_time)
 
 
 def npm_json_schema_diff_validator(path1, path2):
+    """
+    The execution of the containment check using json-schema-diff-validator. The containment is only checked in one!
+    direction (path1 \sub path2). The result is reused for files with the same contents.
+    :param path1: Path to the first file.
+    :param path2: Path to the second file.
+    :return: SubschemaComparison containing the information of the containment check.
+    """
+    return _cached_comparison('json-schema-diff-validator', _npm_json_schema_diff_validator, path1, path2)
+
+
+def _npm_json_schema_diff_validator(path1, path2):
     """
     The execution of the containment check using json-schema-diff-validator. The containment is only checked in one!
     direction (path1 \sub path2).
@@ -94,8 +262,7 @@ def _process_output_from_npm_json_schema_diff_validator(process_result):
     """
     from _model import SubschemaComparison
     # Read the output printed to console of the tool
-    process_output = process_result.stdout.decode('utf-8')
-    lines = process_output.splitlines()
+    status, message, start_time, end_time = _split_npm_output(process_result)
 
     """
     Example-Output:
@@ -116,39 +283,67 @@ def _process_output_from_npm_json_schema_diff_validator(process_result):
     <<<<<<<<<<<<<<
     """
 
-    start_time = float(lines[-2]) / 1000
-    end_time = float(lines[-1]) / 1000
-    lines = lines[:-2]  # Remove start/end line
-
     sub_exception = None
-    if lines[0] == 'OK':
+    if status == b'OK':
         is_sub = True
-    elif lines[0] == 'Exception':
+    elif status == b'Exception':
         is_sub = None
 
+        # The error message is only decoded if an exception occurred
+        lines = message.decode('utf-8').splitlines()
         error_type = None
-        if len(lines) >= 2:
+        if len(lines) >= 1:
             # Use first word of error message as exception type
             # E.G. AssertionError [ERR_ASSERTION]: The schema is not ...
             # "AssertionError" is used as exception type
-            splitted = lines[1].split()
+            splitted = lines[0].split()
             if len(splitted) > 0:
                 error_type = splitted[0]
-        sub_exception = (error_type, "\n".join(lines[1:]))
+        sub_exception = (error_type, "\n".join(lines))
     else:
-        raise ValueError("Invalid output from npm " + process_output)
+        raise ValueError("Invalid output from npm " + process_result.stdout.decode('utf-8'))
 
     return SubschemaComparison(is_sub, sub_exception, start_time, end_time)
 
 
+def _split_npm_output(process_result):
+    """
+    Splits the output of the npm tools (see the example outputs where it is used) into its parts, without decoding the
+    whole output. The output consists of the status line, optional lines with the error message, the start time and the
+    end time (in milliseconds).
+    :param process_result: The output of the tool
+    :return: The status (bytes), the error message (bytes, can be empty), the start time and the end time (in seconds).
+    """
+    output = process_result.stdout.rstrip()
+
+    end_line_start = output.rfind(b'\n') + 1
+    start_line_start = output.rfind(b'\n', 0, end_line_start - 1) + 1
+    end_time = float(output[end_line_start:]) / 1000
+    start_time = float(output[start_line_start:end_line_start - 1]) / 1000
+
+    status_end = output.find(b'\n', 0, start_line_start - 1)
+    if status_end == -1:
+        # No error message, only the status
+        return output[:start_line_start - 1].strip(), b'', start_time, end_time
+    return output[:status_end].strip(), output[status_end + 1:start_line_start - 1], start_time, end_time
+
+
 def _execute_npm_json_schema_diff_validator(path1, path2):
-    npm_path = path.abspath(path.join(path.dirname(path.realpath(__file__)), 'tools/npm-json-schema-diff-validator'))
-    result = subprocess.run(['node', '-r', 'esm', 'cli.js', path1, path2], stdout=subprocess.PIPE,
-                            cwd=npm_path)
-    return result
+    return _npm_json_schema_diff_validator_worker.call(path1, path2)
 
 
 def npm_is_json_schema_subset(path1, path2):
+    """
+    The execution of the containment check using is-json-schema-subset. The containment is only checked in one!
+    direction (path1 \sub path2). The result is reused for files with the same contents.
+    :param path1: Path to the first file.
+    :param path2: Path to the second file.
+    :return: SubschemaComparison containing the information of the containment check.
+    """
+    return _cached_comparison('is-json-schema-subset', _npm_is_json_schema_subset, path1, path2)
+
+
+def _npm_is_json_schema_subset(path1, path2):
     """
     The execution of the containment check using is-json-schema-subset. The containment is only checked in one!
     direction (path1 \sub path2).
@@ -164,10 +359,7 @@ def npm_is_json_schema_subset(path1, path2):
 
 
 def _execute_npm_is_json_schema_subset(path1, path2):
-    npm_path = path.abspath(path.join(path.dirname(path.realpath(__file__)), 'tools/npm-is-json-schema-subset'))
-    result = subprocess.run(['node', '-r', 'esm', 'cli.js', path1, path2], stdout=subprocess.PIPE,
-                            cwd=npm_path)
-    return result
+    return _npm_is_json_schema_subset_worker.call(path1, path2)
 
 
 def _process_output_from_npm_is_json_schema_subset(process_result):
@@ -177,8 +369,7 @@ def _process_output_from_npm_is_json_schema_subset(process_result):
     :return: A object of SubschemaComparison containing all information about the containment check.
     """
     from _model import SubschemaComparison
-    process_output = process_result.stdout.decode('utf-8')
-    lines = process_output.splitlines()
+    status, message, start_time, end_time = _split_npm_output(process_result)
 
     """
     Example output:
@@ -206,34 +397,43 @@ def _process_output_from_npm_is_json_schema_subset(process_result):
     <<<<<<<<<<<<<
     """
 
-    start_time = float(lines[-2]) / 1000
-    end_time = float(lines[-1]) / 1000
-    lines = lines[:-2]  # Remove the start/end line
-
     sub_exception = None
-    if lines[0] == 'OK':
+    if status == b'OK':
         is_sub = True
-    elif lines[0] == 'Fail':
+    elif status == b'Fail':
         is_sub = False
-    elif lines[0] == 'Exception':
+    elif status == b'Exception':
         is_sub = None
 
+        # The error message is only decoded if an exception occurred
+        lines = message.decode('utf-8').splitlines()
         error_type = None
-        if len(lines) >= 2:
+        if len(lines) >= 1:
             # Use first word of error message as exception type
             # E.G. ResolverError: Error opening file ...
             # ResolveError: is used as exception type
-            splitted = lines[1].split()
+            splitted = lines[0].split()
             if len(splitted) > 0:
                 error_type = splitted[0]
-        sub_exception = (error_type, "\n".join(lines[1:]))
+        sub_exception = (error_type, "\n".join(lines))
     else:
-        raise ValueError("Invalid output from npm " + process_output)
+        raise ValueError("Invalid output from npm " + process_result.stdout.decode('utf-8'))
 
     return SubschemaComparison(is_sub, sub_exception, start_time, end_time)
 
 
 def python_jsonsubschema(path1, path2):
+    """
+    The execution of the containment check using jsonsubschema. The containment is only checked in one!
+    direction (path1 \sub path2). The result is reused for files with the same contents.
+    :param path1: Path to the first file.
+    :param path2: Path to the second file.
+    :return: SubschemaComparison containing the information of the containment check.
+    """
+    return _cached_comparison('jsonsubschema', _python_jsonsubschema, path1, path2)
+
+
+def _python_jsonsubschema(path1, path2):
     """
     The execution of the containment check using jsonsubschema. The containment is only checked in one!
     direction (path1 \sub path2).
@@ -244,19 +444,21 @@ def python_jsonsubschema(path1, path2):
     from _model import SubschemaComparison
     logger.info("Compare S1 %s sub S2 %s python jsonsubschema" % (path1, path2))
 
-    s1_json_content = util.load_json(path1)[1]
-    s2_json_content = util.load_json(path2)[1]
+    s1_json_content = util.load_json_cached(path1)[1]
+    s2_json_content = util.load_json_cached(path2)[1]
 
     is_sub = None
     sub_exception = None
 
-    start = time.time()
+    # perf_counter is used to measure the duration, so start and end are not the time since the epoch (like the times of
+    # the npm tools)
+    start = time.perf_counter_ns()
     try:
         is_sub = jsonsubschema.isSubschema(s1_json_content, s2_json_content)
     except BaseException as e:
         sub_exception = (str(type(e)), str(e))
     finally:
-        end = time.time()
+        end = time.perf_counter_ns()
 
     logger.info("End compare S1 %s sub S1 %s" % (path1, path2))
-    return SubschemaComparison(is_sub, sub_exception, start, end)
+    return SubschemaComparison(is_sub, sub_exception, start / 1e9, end / 1e9)
@@ -4,30 +4,57 @@ Create a filter to filter the data on startup used by the different scripts.
 @author: Michael Fruth
 """
 import logging
-import pickle
 
+import _util as util
 import filter_filters
-from _model import GitFile
+from _model import ExecutionSettings, GitFile, GitHistoryFile
 
 logger = logging.getLogger(__name__)
 
 
-def create_filter(output_file, draft_filter: filter_filters.DraftFilter, git_files: [GitFile]):
+def _multiprocessing_reset(git_history_file: GitHistoryFile, is_valid):
+    # Nothing to reset, the result is only a bool
+    pass
+
+
+def create_filter(output_file, draft_filter: filter_filters.DraftFilter, git_files: [GitFile], cores=1, compress=False):
     """
     Creates a new filter-file based on the passed filter.
-    :param output_file: The file in which the filter is stored.
+    :param output_file: The file in which the filter is stored. The file must not exist.
     :param draft_filter: The filter to be used.
     :param git_files: The files to be used for the filter.
+    :param cores: The number of processes used to check the files.
+    :param compress: If the filter-file should be compressed (see util.dump_pickle).
     :return: None
     """
     file_filter = filter_filters.FileDraftFilter(draft_filter)
-    for git_file in git_files:
-        # Store all invalid files in the filter.
-        # Later, the files can be filtered fast based on the stored, invalid files.
-        [file_filter.check_append_invalid(h) for h in git_file.history]
+    # Store all invalid files in the filter.
+    # Later, the files can be filtered fast based on the stored, invalid files.
+    if cores > 1:
+        # Each file is checked independently, so all files are checked in parallel.
+        # Files with the same content have the same result, so only one file per content is checked (the processes
+        # don't share the results of the filters).
+        all_histories = [h for git_file in git_files for h in git_file.history]
+        histories_by_content_hash = {}
+        for h in all_histories:
+            histories_by_content_hash.setdefault(util.content_hash(h.full_path), h)
+        unique_histories = list(histories_by_content_hash.values())
+
+        valid_results = util.multiprocess_and_set_files_later(cores=cores,
+                                                              func=draft_filter.is_valid,
+                                                              iterable=unique_histories,
+                                                              use_map=True,
+                                                              reset_func=_multiprocessing_reset)
+        valid_by_content_hash = dict(zip(histories_by_content_hash.keys(), valid_results))
+        for h in all_histories:
+            if not valid_by_content_hash[util.content_hash(h.full_path)]:
+                file_filter.append_invalid(h)
+    else:
+        for git_file in git_files:
+            for h in git_file.history:
+                file_filter.check_append_invalid(h)
 
-    with open(output_file, 'wb') as f:
-        pickle.dump(file_filter, f)
+    util.dump_pickle(output_file, file_filter, compress=compress, exclusive=True)
 
 
 def main():
@@ -38,15 +65,22 @@ def main():
     del default_args_file_changes[args.CLADraftFilterGroup]
 
     cla_draft_filter_on_the_fly = args.CLADraftFilterOnTheFlyFilter().required().do_nothing()
-    output_file, draft_filter, git_files, git_deleted_files = args.parse_load_file_changes(
-        {
-            args.CLAOutputFile: args.CLAOutputFile().required(),
-            args.CLADraftFilterOnTheFlyFilter: cla_draft_filter_on_the_fly
-        },
-        default_args=default_args_file_changes
-    )
-
-    create_filter(output_file, cla_draft_filter_on_the_fly.draft_filter, git_files)
+    output_file, draft_filter, multiprocessing_cores, compress, git_files, git_deleted_files = \
+        args.parse_load_file_changes(
+            {
+                args.CLAOutputFile: args.CLAOutputFile().required(),
+                args.CLADraftFilterOnTheFlyFilter: cla_draft_filter_on_the_fly,
+                args.CLAMultiprocessingCores: args.CLAMultiprocessingCores(),
+                args.CLACompress: args.CLACompress()
+            },
+            default_args=default_args_file_changes
+        )
+
+    execution_settings = ExecutionSettings()
+    execution_settings.set_multiprocessing_cores(multiprocessing_cores)
+
+    create_filter(output_file, cla_draft_filter_on_the_fly.draft_filter, git_files,
+                  cores=execution_settings.multiprocessing_cores, compress=compress)
 
 
 if __name__ == "__main__":
@@ -14,7 +14,8 @@ logger = logging.getLogger(__name__)
 
 def _valid_draft4_keywords(json_content):
     import draft4_new_keywords_finder
-    result = draft4_new_keywords_finder.check_history_json(json_content)
+    # Only called after the json content was validated against Draft 4, 6 and 7 (see Draft4Filter) - don't validate again
+    result = draft4_new_keywords_finder.check_history_json(json_content, validate_drafts=False)
     if result:
         # Found incompatible/added keywords
         return False
@@ -28,31 +29,24 @@ def _valid_contains_not_keyword(json_content, keyword):
     :param keyword: The keyword to search for
     :return: True if the keyword is NOT contained in the json content, false otherwise.
     """
-    try:
-        keyword_generator = util.find_in_json_recursive(json_content, keyword)
-        next(keyword_generator)
+    for _ in util.find_in_json_recursive(json_content, keyword):
         # keyword is present
         return False
-    except RecursionError:
-        # Recursion error occured while searching for the keyword - search manually
-        # Manual search is "weaker" (because keyword can be in a comment or description), so possibly more results will
-        # be filtered, but this is ok..
-        json_str = str(json_content)
-        if '"{}":'.format(keyword) in json_str:
-            # keyword is present
-            return False
-        else:
-            # keyword isn't present
-            return True
-    except StopIteration:
-        # keyword isn't present
-        return True
+    # keyword isn't present
+    return True
 
 
 #############################################################################
 # Start of the different filter classes
 #############################################################################
 
+# The results of the filters by (filter class, content hash of the file). See Draft4Filter.is_valid.
+_valid_by_content_hash = {}
+# The results of the checks of the (not dereferenced) json content of a file by (drafts, check of "not", content hash of the
+# file). These checks are the same for the filters with and without _check_references. See Draft4Filter._is_valid.
+_valid_content_by_content_hash = {}
+
+
 class DraftFilter:
     """
     The base class for all filters.
@@ -82,8 +76,8 @@ class DraftFilter:
         :param git_history_file: The file to check.
         :return: True if the file is valid to all drafts, false otherwise.
         """
-        json_content = util.load_json(git_history_file.full_path)[1]  # [1] is the json_content
-        return cls._valid_all_drafts_json(json_content)
+        drafts_validation = util.schema_validate_all_drafts_of_file(git_history_file.full_path)
+        return cls._valid_drafts_validation(drafts_validation)
 
     @classmethod
     def _valid_all_drafts_json(cls, json_content):
@@ -92,7 +86,16 @@ class DraftFilter:
         :param json_content: The file to check.
         :return: True if the file is valid to all drafts, false otherwise.
         """
-        drafts_validation = util.schema_validate_all_drafts(json_content)
+        return cls._valid_drafts_validation(util.schema_validate_all_drafts(json_content))
+
+    @classmethod
+    def _valid_drafts_validation(cls, drafts_validation):
+        """
+        Checks whether the result of the validation (see util.schema_validate_all_drafts) is valid to all drafts
+        specified in _drafts_to_validate.
+        :param drafts_validation: The result of the validation.
+        :return: True if the file is valid to all drafts, false otherwise.
+        """
         for draft in cls._drafts_to_validate:
             # Draft is valid -> result is None;
             # Exception occurred -> result is not None
@@ -111,10 +114,30 @@ class FileDraftFilter(DraftFilter):
     def __init__(self, draft_filter: DraftFilter):
         self.draft_filter = draft_filter
         self.invalid_files = []
+        # The keys (see _key) of the invalid files for a fast lookup. Not pickled, it's rebuilt from the invalid_files.
+        self._invalid_keys = set()
 
     def __str__(self):
         return str(type(self.draft_filter))
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_invalid_keys']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._invalid_keys = {self._key(f) for f in self.invalid_files}
+
+    @staticmethod
+    def _key(git_history_file: GitHistoryFile):
+        """
+        The key of the file, based on the same attributes as GitHistoryFile.__eq__.
+        :param git_history_file: The file.
+        :return: A hashable key of the file.
+        """
+        return git_history_file.sha, git_history_file.new_path, git_history_file.old_path
+
     def check_append_invalid(self, git_history_file):
         """
         Appends the file to the list of invalid_files if its invalid. The specified filter is used for validation.
@@ -122,17 +145,25 @@ class FileDraftFilter(DraftFilter):
         :return: None.
         """
         if not self.draft_filter.is_valid(git_history_file):
-            self.invalid_files.append(git_history_file)
+            self.append_invalid(git_history_file)
+
+    def append_invalid(self, git_history_file):
+        """
+        Appends the file to the list of invalid_files. Use this only if the file was already checked by the specified
+        filter (e.g. in another process), otherwise use check_append_invalid.
+        :param git_history_file: The invalid file.
+        :return: None.
+        """
+        self.invalid_files.append(git_history_file)
+        self._invalid_keys.add(self._key(git_history_file))
 
     def is_valid(self, git_history_file: GitHistoryFile):
         """
-        Check if the file is in the list of invalid files (__eq__ is overwritten in GitHistoryFile, so this works).
+        Check if the file is in the invalid files (by the same attributes which are compared by GitHistoryFile.__eq__).
         :param git_history_file: The file to check
         :return: True if the file is not contained in the invalid files, false otherwise.
         """
-        if git_history_file in self.invalid_files:
-            return False
-        return True
+        return self._key(git_history_file) not in self._invalid_keys
 
 
 class Draft4Filter(DraftFilter):
@@ -141,19 +172,69 @@ class Draft4Filter(DraftFilter):
     1. File must be valid to Draft 4 until Draft 7 (Draft 4, 6, 7)
     2. File should not contain any keywords added/introduced in Draft 6 or Draft 7
     """
-    DraftFilter._drafts_to_validate = [
+    _drafts_to_validate = (
         util.DRAFT4_NAME,
         util.DRAFT6_NAME,
         util.DRAFT7_NAME
-    ]
+    )
 
     def is_valid(self, git_history_file: GitHistoryFile):
-        logger.info("File: {}".format(git_history_file.full_path))
-        json_content = util.load_json(git_history_file.full_path)[1]
-        return self._is_valid(json_content)
+        """
+        Loads the file and checks if it is valid to the specific filter (see _is_valid). The result is reused for files
+        with the same content.
+        :param git_history_file: The file to check.
+        :return: True if the file is valid to the specific filter, false otherwise.
+        """
+        logger.info("File: %s", git_history_file.full_path)
+        content_hash = util.content_hash(git_history_file.full_path)
+        key = (type(self), content_hash)
+        if key not in _valid_by_content_hash:
+            json_content = util.load_json_cached(git_history_file.full_path)[1]
+            _valid_by_content_hash[key] = self._is_valid(json_content, content_hash)
+        return _valid_by_content_hash[key]
+
+    # If the checks should be done again with the dereferenced json content (see Draft4ValidJsonRef)
+    _check_references = False
+    # If files containing the keyword "not" should be filtered (see Draft4NoNot)
+    _check_not = False
+
+    def _is_valid(self, json_content, content_hash=None):
+        """
+        Checks the json content and, if _check_references is set, the dereferenced json content. The cheaper checks are
+        done first and the json content is only dereferenced if the json content itself is valid.
+        :param json_content: The content to check.
+        :param content_hash: The content hash of the file of the json content (see util.content_hash). If set, the
+        result of the check of the json content itself is reused for files with the same content, also by the filters
+        which check the same conditions without/with the dereferenced json content (e.g. Draft4Filter and
+        Draft4ValidJsonRef).
+        :return: True if the json content is valid to the specific filter, false otherwise.
+        """
+        if content_hash is None:
+            is_valid_content = self._is_valid_content(json_content)
+        else:
+            key = (self._drafts_to_validate, self._check_not, content_hash)
+            if key not in _valid_content_by_content_hash:
+                _valid_content_by_content_hash[key] = self._is_valid_content(json_content)
+            is_valid_content = _valid_content_by_content_hash[key]
+        if not is_valid_content:
+            return False
 
-    def _is_valid(self, json_content):
-        if not Draft4Filter._valid_all_drafts_json(json_content):
+        if self._check_references:
+            json_content_ref = jsonref.JsonRef.replace_refs(json_content)
+
+            # Same checks but now the dereferenced JsonContent.
+            if not self._is_valid_content(json_content_ref):
+                return False
+
+        return True
+
+    def _is_valid_content(self, json_content):
+        # Validation must be done first: the keyword search is only done on valid json contents
+        if not self._valid_all_drafts_json(json_content):
+            return False
+
+        # Keyword "not" check - stops at the first finding, so it's cheaper than the search for the Draft 6/7 keywords
+        if self._check_not and not _valid_contains_not_keyword(json_content, "not"):
             return False
 
         if not _valid_draft4_keywords(json_content):
@@ -170,24 +251,7 @@ class Draft4ValidJsonRef(Draft4Filter):
     This means: All files containing e.g. invalid JsonReferences or RecursionErrors are filtered. Also, if a reference
     exists to an online resource and some invaild keywords are introduced through this source, this file will be filtered.
     """
-
-    def is_valid(self, git_history_file: GitHistoryFile):
-        logger.info("File: {}".format(git_history_file.full_path))
-        json_content = util.load_json(git_history_file.full_path)[1]
-        return self._is_valid(json_content)
-
-    def _is_valid(self, json_content):
-        # Draft4Filter-Check
-        if not super()._is_valid(json_content):
-            return False
-
-        json_content_ref = jsonref.JsonRef.replace_refs(json_content)
-
-        # Draft4Filter-Check but now the dereferenced JsonContent.
-        if not super()._is_valid(json_content_ref):
-            return False
-
-        return True
+    _check_references = True
 
 
 class Draft4NoNot(Draft4Filter):
@@ -196,22 +260,7 @@ class Draft4NoNot(Draft4Filter):
     1. See conditions of Draft4Filter
     2. Filters all files which contains the keyword "not"
     """
-
-    def is_valid(self, git_history_file: GitHistoryFile):
-        logger.info("File: {}".format(git_history_file.full_path))
-        json_content = util.load_json(git_history_file.full_path)[1]
-        return self._is_valid(json_content)
-
-    def _is_valid(self, json_content):
-        # Draft4Filter-Check
-        if not super()._is_valid(json_content):
-            return False
-
-        # Keyword "not" check
-        if not _valid_contains_not_keyword(json_content, "not"):
-            return False
-
-        return True
+    _check_not = True
 
 
 class Draft4ValidJsonRefNoNot(Draft4Filter):
@@ -221,29 +270,8 @@ class Draft4ValidJsonRefNoNot(Draft4Filter):
     2. All references are evaluated and checked again with the conditions of 1. (see Draft4FilterJsonRef for more details)
     3. Filters all files which contains the keyword "not". They keyword will also be searched in the dereferenced json content. (see Draft4FilterNoNot for more details)
     """
-
-    def is_valid(self, git_history_file: GitHistoryFile):
-        logger.info("File: {}".format(git_history_file.full_path))
-        json_content = util.load_json(git_history_file.full_path)[1]
-        return self._is_valid(json_content)
-
-    def _is_valid(self, json_content):
-        # Draft4Filter-Check
-        if not super()._is_valid(json_content):
-            return False
-        # keyword "not" check
-        if not _valid_contains_not_keyword(json_content, "not"):
-            return False
-
-        json_content_ref = jsonref.JsonRef.replace_refs(json_content)
-
-        # Draft4FilterJsonRef-Check
-        if not super()._is_valid(json_content_ref):
-            return False
-        # keyword "not" check with dereferenced json content
-        if not _valid_contains_not_keyword(json_content_ref, "not"):
-            return False
-        return True
+    _check_references = True
+    _check_not = True
 
 
 #############################################################################
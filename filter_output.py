@@ -8,7 +8,9 @@ logger = logging.getLogger(__name__)
 def output(draft_filter: filter_filters.FileDraftFilter):
     # Print all information about the filter;
     # The filtered files, the used filter and the total amount of filtered files.
-    [print("\t{}".format(file.full_path)) for file in draft_filter.invalid_files]
+    # Printed at once, because printing each file separately is slow for many files
+    if len(draft_filter.invalid_files) > 0:
+        print("\n".join("\t{}".format(file.full_path) for file in draft_filter.invalid_files))
     print("File Filter containing draft filter {}".format(draft_filter))
     print("Total filtered files: {}".format(len(draft_filter.invalid_files)))
 
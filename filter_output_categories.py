@@ -13,6 +13,51 @@ import filter_filters
 logger = logging.getLogger(__name__)
 
 
+def _strip_file_ending(filename, file_endings):
+    """
+    Removes the first matching file ending of the filename.
+    :param filename: The filename.
+    :param file_endings: The file endings to remove (e.g. ".json").
+    :return: The filename without the file ending.
+    """
+    for file_ending in file_endings:
+        if filename.endswith(file_ending):
+            return filename[:-len(file_ending)]
+    return filename
+
+
+# Filenames which are matched manually (without the heuristic) to a category: (prefix, category-file)
+# If multiple prefixes match, the last one is used.
+_MANUAL_CATEGORIES = (
+    ("sarif", "sarif-1.0.0.json"),
+    ("swagger", "Swagger API 2.0"),
+)
+
+
+def _match_manually(similar_filtered_filename):
+    """
+    Returns the category-file of the filename if the filename is matched manually (see _MANUAL_CATEGORIES).
+    :param similar_filtered_filename: The filename (lowered and without file ending).
+    :return: The category-file or None if the filename isn't matched manually.
+    """
+    file_category = None
+    for prefix, manual_file_category in _MANUAL_CATEGORIES:
+        if similar_filtered_filename.startswith(prefix):
+            file_category = manual_file_category
+    return file_category
+
+
+def _can_be_new_highest(upper_bound, highest_ratio, min_ratio_limit):
+    """
+    Checks if a ratio with the given upper bound can be a new highest ratio that reaches the limit.
+    :param upper_bound: The upper bound of the ratio (e.g. SequenceMatcher.quick_ratio()).
+    :param highest_ratio: The highest ratio found so far.
+    :param min_ratio_limit: The minimum ratio for a match.
+    :return: True if the ratio can be a new highest ratio, false otherwise.
+    """
+    return upper_bound >= min_ratio_limit and upper_bound > highest_ratio
+
+
 def match(invalid_filenames, categories):
     """
     Tries to match the filenames with the categories. A heuristic (SequenceMatcher) is used.
@@ -22,33 +67,43 @@ def match(invalid_filenames, categories):
     """
     min_ratio_limit = 0.8  # Minimum 80% must match
 
+    # Prepare the filenames of the categories only once: lower to be case-insensitive and remove file ending.
+    # The SequenceMatcher caches the information about the second sequence, so one matcher is used per category.
+    prepared_categories = []
+    for file_category in categories:
+        similar_filename_category = _strip_file_ending(file_category.lower(), (".json", ".yml"))
+        matcher = difflib.SequenceMatcher(None, b=similar_filename_category)
+        prepared_categories.append((file_category, similar_filename_category, matcher))
+
     resulting_categories = {}
     for filename in invalid_filenames:
 
-        similar_filtered_filename = filename.lower()  # Lower to be case-insensitive
-        # Remove fileending
-        if similar_filtered_filename.endswith(".json"):
-            similar_filtered_filename = similar_filtered_filename[:-len(".json")]
+        similar_filtered_filename = _strip_file_ending(filename.lower(), (".json",))  # Lower to be case-insensitive
 
         highest_ratio = -1
         highest_ratio_file_categorie = None
 
-        for file_category in categories:
+        manual_file_category = _match_manually(similar_filtered_filename)
+        if manual_file_category is not None and len(prepared_categories) > 0:
+            highest_ratio = min_ratio_limit
+            highest_ratio_file_categorie = manual_file_category
+            prepared_filename_categories = ()
+        else:
+            prepared_filename_categories = prepared_categories
 
-            similar_filename_category = file_category.lower()  # Lower to be case-insensitive
-            # Remove fileending
-            if similar_filename_category.endswith(".json"):
-                similar_filename_category = similar_filename_category[:-len(".json")]
-            elif similar_filename_category.endswith(".yml"):
-                similar_filename_category = similar_filename_category[:-len(".yml")]
+        for file_category, similar_filename_category, matcher in prepared_filename_categories:
 
-            # Apply the heuristic
-            ratio = difflib.SequenceMatcher(None, similar_filtered_filename, similar_filename_category).ratio()
+            # Apply the heuristic. Ratios below the limit are never used, so the (expensive) ratio is only computed
+            # if the upper bounds of the ratio (real_quick_ratio, quick_ratio) can reach a new highest ratio.
+            matcher.set_seq1(similar_filtered_filename)
+            if _can_be_new_highest(matcher.real_quick_ratio(), highest_ratio, min_ratio_limit) and \
+                    _can_be_new_highest(matcher.quick_ratio(), highest_ratio, min_ratio_limit):
+                ratio = matcher.ratio()
 
-            if ratio > highest_ratio:
-                # New highest ratio found
-                highest_ratio = ratio
-                highest_ratio_file_categorie = file_category
+                if ratio > highest_ratio:
+                    # New highest ratio found
+                    highest_ratio = ratio
+                    highest_ratio_file_categorie = file_category
 
             if highest_ratio < min_ratio_limit and similar_filename_category in similar_filtered_filename:
                 # Make matching a bit "weaker". If no highest-ratio was found until now and the word of the category
@@ -57,15 +112,6 @@ def match(invalid_filenames, categories):
                 highest_ratio = min_ratio_limit
                 highest_ratio_file_categorie = file_category
 
-            # Match sarif manually
-            if similar_filtered_filename.startswith("sarif"):
-                highest_ratio = min_ratio_limit
-                highest_ratio_file_categorie = "sarif-1.0.0.json"
-            # Match swagger manually
-            if similar_filtered_filename.startswith("swagger"):
-                highest_ratio = min_ratio_limit
-                highest_ratio_file_categorie = "Swagger API 2.0"
-
         # Save category if a match was found that has a higher ratio than the limit.
         if highest_ratio >= min_ratio_limit:
             category = categories[highest_ratio_file_categorie]
@@ -76,8 +122,8 @@ def match(invalid_filenames, categories):
     print("Unique files: {}".format(len(invalid_filenames)))
     print("Filtered categories:")
 
-    for cat in resulting_categories:
-        print("{}: {}".format(cat, len(resulting_categories[cat])))
+    if len(resulting_categories) > 0:
+        print("\n".join("{}: {}".format(cat, len(resulting_categories[cat])) for cat in resulting_categories))
 
 
 """
@@ -110,7 +156,7 @@ def get_filenames(draft_filter: filter_filters.FileDraftFilter):
     :param draft_filter: The filter which contains the all files.
     :return: A sorted list containg the filenames of the stored files of the filter.
     """
-    invalid_files = list(map(lambda f: path.basename(f.full_path), draft_filter.invalid_files))
+    invalid_files = [path.basename(f.full_path) for f in draft_filter.invalid_files]
     invalid_files.sort()
     return invalid_files
 
@@ -5,23 +5,32 @@ Computes the history of the files based on the history of a repository.
 """
 import logging
 import os
-import pickle
 from os import path
 
-from git import Repo
+import pygit2
 
 import _util as util
 from _model import GitFile, GitHistoryFile
 
 logger = logging.getLogger(__name__)
 
-_files: {str, GitFile} = {}
-_deleted: [GitFile] = []
 
+class _FileChanges:
+    """
+    The state of one extraction: the currently tracked files and the deleted files. Each extraction creates its own
+    state, so multiple extractions can run (e.g. in parallel) without interfering with each other.
+    """
+
+    def __init__(self):
+        # The current path of the file and the root file
+        self.files: {str, GitFile} = {}
+        self.deleted: [GitFile] = []
 
-def _add_new_file(git_file: GitFile, commit_count=None, git_history_file=None):
+
+def _add_new_file(state: _FileChanges, git_file: GitFile, commit_count=None, git_history_file=None):
     """
     Adds/creates a new file (root file, which stores all versions of a file).
+    :param state: The state of the extraction.
     :param git_file: The root file.
     :param commit_count: The commit count - must only be set if git_history_file is None
     :param git_history_file: The first version of the file
@@ -31,12 +40,13 @@ def _add_new_file(git_file: GitFile, commit_count=None, git_history_file=None):
         # Create versioned file from the data
         git_history_file = GitHistoryFile(git_file.added_sha, None, git_file.path, 'A', commit_count)
     git_file.history.append(git_history_file)
-    _files[git_file.path] = git_file
+    state.files[git_file.path] = git_file
 
 
-def _add_history_file(git_history_file: GitHistoryFile):
+def _add_history_file(state: _FileChanges, git_history_file: GitHistoryFile):
     """
     Adds a new versioned file.
+    :param state: The state of the extraction.
     :param git_history_file: The versioned file
     :return: None
     """
@@ -46,75 +56,89 @@ def _add_history_file(git_history_file: GitHistoryFile):
 
     if change_type == 'A':
         # Added
-        _add_new_file(GitFile(new_path, git_history_file.sha), git_history_file=git_history_file)
+        _add_new_file(state, GitFile(new_path, git_history_file.sha), git_history_file=git_history_file)
     elif change_type == 'D':
         # Deleted
         # Append to the root file
-        git_file = _files[old_path]
+        git_file = state.files[old_path]
         git_file.history.append(git_history_file)
 
         # Set deleted sha of the root file, remove it from the current files and add it to the deleted files
         git_file.deleted_sha = git_history_file.sha
-        del _files[old_path]
-        _deleted.append(git_file)
+        del state.files[old_path]
+        state.deleted.append(git_file)
     else:
         # Other (Change, Renaming etc..)
         # Append to the root file
-        git_file = _files[old_path]
+        git_file = state.files[old_path]
         git_file.history.append(git_history_file)
 
         if old_path != new_path:
-            # Rename occurred - change keys stored in _files
-            del _files[old_path]
-            _files[new_path] = git_file
+            # Rename occurred - change keys stored in the files
+            del state.files[old_path]
+            state.files[new_path] = git_file
             # Also change the "path" to the current path of the git_file
             git_file.path = new_path
 
 
-def _get_tracked_files(trees):
+def _get_tracked_files(tree: pygit2.Tree):
     """
-    Returns all tracked files of a repository-tree.
-    :param trees: The repository-tree.
+    Generator-implementation to get all tracked files of a repository-tree. The tree is traversed with an explicit stack
+    (the files of a tree first, then the files of its sub-trees in their order) instead of recursive calls.
+    pygit2 doesn't provide a walk over a tree.
+    :param tree: The repository-tree.
     :return: The paths of the tracked files.
     """
-    paths = []
-    for tree in trees:
-        for blob in tree.blobs:
-            paths.append(blob.path)
-        if tree.trees:
-            paths.extend(_get_tracked_files(tree.trees))
-    return paths
-
-
-def _initialize_files(version_directory):
+    # Each entry is a tree and its path
+    stack = [(tree, '')]
+    while stack:
+        current, tree_path = stack.pop()
+        sub_trees = []
+        for entry in current:
+            entry_path = entry.name if not tree_path else tree_path + '/' + entry.name
+            if entry.type == pygit2.GIT_OBJECT_BLOB:
+                yield entry_path
+            elif entry.type == pygit2.GIT_OBJECT_TREE:
+                sub_trees.append((entry, entry_path))
+        # Reversed, so the first sub-tree is processed first
+        stack.extend(reversed(sub_trees))
+
+
+def _head_commit(repo: pygit2.Repository):
+    return repo.head.peel(pygit2.Commit)
+
+
+def _initialize_files(state: _FileChanges, commit: pygit2.Commit, commit_count):
     """
     Adds all files of the repository to the tracked files. This method should be called with the initial or the lastest
     state of the repository.
-    :param version_directory: The directory representing the first/latest state of the repository.
+    :param state: The state of the extraction.
+    :param commit: The commit of the first/latest state of the repository.
+    :param commit_count: The commit count of the commit.
     :return: None
     """
-    repo = Repo(version_directory)
+    # Add all files existing in this version to the tracked files
+    for tracked_file in _get_tracked_files(commit.tree):
+        _add_new_file(state, GitFile(tracked_file, str(commit.id)), commit_count=commit_count)
 
-    tracked_files = _get_tracked_files([repo.tree()])
-    # Add all files existing in this version to the global tracked files
-    for tracked_file in tracked_files:
-        commit_count = util.info_from_commit_directory_name(version_directory)[0]
-        _add_new_file(GitFile(tracked_file, repo.commit().hexsha), commit_count=commit_count)
 
-
-def _diff_directories(version_before_directory, version_directory):
+def _diff_directories(state: _FileChanges, version_before_directory, commit_before: pygit2.Commit, version_directory,
+                      commit: pygit2.Commit, commit_count):
     """
     Gets the difference (from git) of the repositories.
+    :param state: The state of the extraction.
     :param version_before_directory: The directory before
+    :param commit_before: The HEAD commit of the repository in the directory before.
     :param version_directory: The "current"/subsequent directory
+    :param commit: The HEAD commit of the repository in the "current"/subsequent directory.
+    :param commit_count: The commit count of the "current"/subsequent directory.
     :return: None
     """
     logger.info("Diff of %s and %s" % (version_before_directory, version_directory))
 
-    repo_before = Repo(version_before_directory)
-    repo = Repo(version_directory)
-
-    if repo.git.rev_parse('HEAD~1') != repo_before.commit().hexsha:
+    # HEAD~1 is the first parent of HEAD
+    parent_sha = str(commit.parent_ids[0]) if commit.parent_ids else None
+    if parent_sha != str(commit_before.id):
         raise ValueError(
             "The SHA of HEAD~1 (previous commit of the current directory) doesn't match the SHA of the directory "
             "containing the previous commit. Comparing directories:\n"
@@ -122,24 +146,37 @@ def _diff_directories(version_before_directory, version_directory):
             "\tCurrent SHA: %s\n"
             "\tPrevious directory: %s\n"
             "\tPrevious SHA: %s"
-            % (version_directory, repo.git.rev_parse('HEAD~1'), version_before_directory, repo_before.commit().hexsha))
-
-    commit_before = repo_before.commit()
-    commit = repo.commit()
+            % (version_directory, parent_sha, version_before_directory, str(commit_before.id)))
 
-    # https://gitpython.readthedocs.io/en/stable/reference.html#git.diff.Diff
-    # Compute the difference of the two commits before and after
-    diffs = commit_before.diff(commit)
-    if len(diffs) == 0:
+    # Both commits are available in the current directory
+    if not _diff_commits(state, commit.parents[0], commit, commit_count):
         logger.warning("Diff of %s and %s is empty!" % (version_before_directory, version_directory))
-    for diff in diffs:
-        old_path = diff.a_path
-        new_path = diff.b_path
 
-        commit_count = util.info_from_commit_directory_name(version_directory)[0]  # commit_count
-        git_history_file = GitHistoryFile(commit.hexsha, old_path, new_path, diff.change_type, commit_count)
 
-        _add_history_file(git_history_file)
+def _diff_commits(state: _FileChanges, commit_before: pygit2.Commit, commit: pygit2.Commit, commit_count):
+    """
+    Adds the versioned files of the difference (from git) of the two commits.
+    :param state: The state of the extraction.
+    :param commit_before: The commit before.
+    :param commit: The "current"/subsequent commit.
+    :param commit_count: The commit count of the "current"/subsequent commit.
+    :return: False if the difference is empty, True otherwise.
+    """
+    # Compute the difference of the two commits before and after. Only the changed files (deltas) are needed, so no
+    # patches are created and the files aren't checked for binary content. Submodules are not tracked.
+    # Renames are detected in the same way as "git diff -M".
+    diff = commit_before.tree.diff_to_tree(commit.tree,
+                                           flags=pygit2.GIT_DIFF_SKIP_BINARY_CHECK | pygit2.GIT_DIFF_IGNORE_SUBMODULES,
+                                           context_lines=0)
+    diff.find_similar(flags=pygit2.GIT_DIFF_FIND_RENAMES)
+    for delta in diff.deltas:
+        old_path = delta.old_file.path
+        new_path = delta.new_file.path
+
+        git_history_file = GitHistoryFile(str(commit.id), old_path, new_path, delta.status_char(), commit_count)
+
+        _add_history_file(state, git_history_file)
+    return len(diff) > 0
 
 
 def extract_file_changes(commits_directory, track_paths=None, output_file=None, validate_master=None):
@@ -148,36 +185,39 @@ def extract_file_changes(commits_directory, track_paths=None, output_file=None,
     commit the changed/added/removed files and creates a version of the file for each change.
     :param commits_directory: The commit directory in which all the cloned repositories reside
     :param track_paths: If some files should be filtered by path (e.g. consider only files in the sub-directory src/schemas/json/)
-    :param output_file: The file in which the the file differences are stored.
+    :param output_file: The file in which the the file differences are stored. The file must not exist.
     :param validate_master: The bare-master repository for validation.
     :return: the created files and the deleted files are returnd as list.
     """
-    # track_paths must be a list
-    if not track_paths:
-        track_paths = ''
-    if not isinstance(track_paths, list):
-        track_paths = [track_paths]
-
     # Get all commit directories (all directories containing the different versions of the repository)
     commit_directories = [path.join(commits_directory, d) for d in os.listdir(commits_directory)]
     commit_directories = [d for d in commit_directories if os.path.isdir(d)]
     # Sort directories based on count (number of available commits
     # High number = current sate; Low number = initial state
-    commit_directories.sort(key=lambda x: util.info_from_commit_directory_name(x)[0],
-                            reverse=False)
+    # The count is parsed only once for each directory
+    commit_counts_and_directories = [(util.info_from_commit_directory_name(d)[0], d) for d in commit_directories]
+    commit_counts_and_directories.sort(key=lambda x: x[0], reverse=False)
+    commit_counts = [count for count, _ in commit_counts_and_directories]
+    commit_directories = [d for _, d in commit_counts_and_directories]
 
-    # [0] = initial state. Add all files added in the first commit to the global tracked filed.
+    state = _FileChanges()
+
+    # [0] = initial state. Add all files added in the first commit to the tracked filed.
     # This files aren't recognized later by computing the difference
-    _initialize_files(commit_directories[0])
+    # Each repository is opened only once: the HEAD commit is used for the validation and for the differences to the
+    # previous and to the next repository.
+    commit = _head_commit(pygit2.Repository(commit_directories[0]))
+    _initialize_files(state, commit, commit_counts[0])
 
     if validate_master:
         # Every version of the repository is locally available as own repository.
         # These versions can also be accessed from the root-repository. If validate_master is given, it will be checked
         # if the commit hash of the directory-repository does match the expected commit-hash from the history of the
         # master-repository.
-        master = Repo(validate_master)
-        commits = master.iter_commits(first_parent=True)
-        commits = list(commits)
+        master = pygit2.Repository(validate_master)
+        walker = master.walk(_head_commit(master).id)
+        walker.simplify_first_parent()
+        commits = [str(c.id) for c in walker]
         commits.reverse()  # Reverse, because repositories are processed from intial to current state.
 
         if len(commits) != len(commit_directories):
@@ -188,49 +228,104 @@ def extract_file_changes(commits_directory, track_paths=None, output_file=None,
         if validate_master:
             # Check if the hash of the directory matches the hash of the history of the master-repository.
             logger.info("Validate %d/%d" % (i + 1, len(commit_directories)))
-            directory_sha = Repo(commit_directories[i]).commit().hexsha
-            commit_sha = commits[i].hexsha
+            directory_sha = str(commit.id)
+            commit_sha = commits[i]
             if commit_sha != directory_sha:
                 raise ValueError("Different SHA for master %s and %s" % (commit_sha, directory_sha))
 
         if i + 1 < len(commit_directories):
             # Compute difference of two successive repositories (get the difference - git diff - of them)
-            _diff_directories(commit_directories[i], commit_directories[i + 1])
+            next_commit = _head_commit(pygit2.Repository(commit_directories[i + 1]))
+            _diff_directories(state, commit_directories[i], commit, commit_directories[i + 1], next_commit,
+                              commit_counts[i + 1])
+            commit = next_commit
+
+    return _store_file_changes(state, track_paths, output_file)
+
+
+def extract_file_changes_from_bare(bare_master_directory, track_paths=None, output_file=None):
+    """
+    Same as extract_file_changes, but the file changes are extracted from the "mainline" (--first-parent in git) commits
+    of the bare-master repository (see module git_history_cloner) instead of the cloned repositories. The commit count
+    of a commit is the same as in the name of its cloned repository, so the cloned repositories are still needed to
+    access the contents of the files (see GitHistoryFile.set_full_path).
+    :param bare_master_directory: The bare-master repository.
+    :param track_paths: If some files should be filtered by path (e.g. consider only files in the sub-directory src/schemas/json/)
+    :param output_file: The file in which the the file differences are stored. The file must not exist.
+    :return: the created files and the deleted files are returnd as list.
+    """
+    repo = pygit2.Repository(bare_master_directory)
+    walker = repo.walk(_head_commit(repo).id)
+    walker.simplify_first_parent()
+    commits = list(walker)
+    commits.reverse()  # Reverse, because commits are processed from intial to current state.
+
+    state = _FileChanges()
+
+    # The commit count is the number of commits until the commit (including the commit itself)
+    _initialize_files(state, commits[0], 1)
+    for i in range(1, len(commits)):
+        logger.info("Diff of %s and %s" % (commits[i - 1].id, commits[i].id))
+        if not _diff_commits(state, commits[i - 1], commits[i], i + 1):
+            logger.warning("Diff of %s and %s is empty!" % (commits[i - 1].id, commits[i].id))
+
+    return _store_file_changes(state, track_paths, output_file)
+
+
+def _store_file_changes(state: _FileChanges, track_paths, output_file):
+    """
+    Filters, sorts and prints the extracted files and stores them in the output file.
+    :param state: The state of the extraction.
+    :param track_paths: The paths to filter the files (see extract_file_changes).
+    :param output_file: The file in which the the file differences are stored. The file must not exist.
+    :return: the created files and the deleted files are returnd as list.
+    """
+    # track_paths must be a list
+    if not track_paths:
+        track_paths = ''
+    if not isinstance(track_paths, list):
+        track_paths = [track_paths]
+    track_paths = tuple(track_paths)  # Tuple for startswith
 
     # Filter files based on the path (e.g. all filenames have to start with src/schemas/json/...)
-    files: [GitFile] = [f for f in _files.values() if f.path.startswith(tuple(track_paths))]
-    deleted: [GitFile] = [f for f in _deleted if f.path.startswith(tuple(track_paths))]
+    files: [GitFile] = [f for f in state.files.values() if f.path.startswith(track_paths)]
+    deleted: [GitFile] = [f for f in state.deleted if f.path.startswith(track_paths)]
 
-    # Sort files by their history length
+    # Sort files by their history length. All files are printed and stored, so a complete sort is needed (the key is
+    # computed only once for each file by sort).
     files.sort(key=lambda x: len(x.history), reverse=True)
     deleted.sort(key=lambda x: len(x.history), reverse=True)
 
-    [print(f) for f in files]
+    # Printed at once, because printing each file separately is slow for many files
+    if len(files) > 0:
+        print("\n".join(str(f) for f in files))
     if output_file:
-        with open(output_file, 'wb') as f:
-            # Save files to disk
-            pickle.dump((files, deleted), f)
+        # Save files to disk
+        util.dump_pickle(output_file, (files, deleted), exclusive=True)
     return files, deleted
 
 
 def main():
     import _arguments as args
 
-    cla_commit_directory = args.CLACommitDirectory().required()
+    cla_source_group = args.CLAFileChangesSourceGroup().required()
     cla_validate_directory = args.CLAGitValidate()
     cla_output_file = args.CLAOutputFile().required()
     cla_paths = args.CLAPathsFilter()
     args.parse_load(
         {
-            args.CLACommitDirectory: cla_commit_directory,
+            args.CLAFileChangesSourceGroup: cla_source_group,
             args.CLAGitValidate: cla_validate_directory,
             args.CLAOutputFile: cla_output_file,
             args.CLAPathsFilter: cla_paths
         }
     )
 
-    extract_file_changes(cla_commit_directory.value, cla_paths.value, cla_output_file.value,
-                         cla_validate_directory.value)
+    if isinstance(cla_source_group.active_cla, args.CLABareMaster):
+        extract_file_changes_from_bare(cla_source_group.value, cla_paths.value, cla_output_file.value)
+    else:
+        extract_file_changes(cla_source_group.value, cla_paths.value, cla_output_file.value,
+                             cla_validate_directory.value)
 
 
 if __name__ == "__main__":
@@ -3,6 +3,8 @@
 Outputs statistics about the history of the files computed by git_file_changes.py
 @author: Michael Fruth
 """
+from collections import Counter
+
 import filter_filters
 from _model import GitFile, GitHistoryFile
 
@@ -13,11 +15,7 @@ def output_occurrences(git_files):
     :param git_files: The root files containing the version files.
     :return: None
     """
-    occurrence = {}
-    for git_file in git_files:
-        if len(git_file.history) not in occurrence:
-            occurrence[len(git_file.history)] = 0
-        occurrence[len(git_file.history)] += 1
+    occurrence = Counter(len(git_file.history) for git_file in git_files)
 
     for length, count in occurrence.items():
         print("History: {} ({} schema(s))".format(length, count))
@@ -30,6 +28,8 @@ def output_history_number(git_files: [GitFile]):
     :param git_files: The root files containing the version files.
     :return: None.
     """
+    # All lines are printed at once, because printing each file separately is slow for many files
+    lines = []
     git_file: GitFile
     for git_file in git_files:
         min_count = None
@@ -37,8 +37,10 @@ def output_history_number(git_files: [GitFile]):
         if len(git_file.history) > 0:
             min_count = git_file.history[0].commit_count
             max_count = git_file.history[-1].commit_count
-        print("{}: {} version(s) | Min-Count: {} Max-Count: {}".format(git_file.path, len(git_file.history), min_count,
-                                                                       max_count))
+        lines.append("{}: {} version(s) | Min-Count: {} Max-Count: {}".format(git_file.path, len(git_file.history),
+                                                                              min_count, max_count))
+    if len(lines) > 0:
+        print("\n".join(lines))
 
 
 def count_successive_schemas(git_files: [GitFile]):
@@ -47,12 +49,8 @@ def count_successive_schemas(git_files: [GitFile]):
     :param git_files: The root files containing the versioned files.
     :return: The number of successive schema versions
     """
-    counter = 0
-    for git_file in git_files:
-        for i in range(len(git_file.history)):
-            if i + 1 < len(git_file.history):
-                counter += 1
-    return counter
+    # A history of n versions contains n - 1 successive versions
+    return sum(max(0, len(git_file.history) - 1) for git_file in git_files)
 
 
 def count_unique_commit_counts(git_files):
@@ -61,13 +59,7 @@ def count_unique_commit_counts(git_files):
     :param git_files: The root files containing the versioned files.
     :return: The number of unique commit counts.
     """
-    commit_counts = set()
-    for git_file in git_files:
-        h: GitHistoryFile
-        for h in git_file.history:
-            commit_counts.add(h.commit_count)
-
-    return commit_counts
+    return {h.commit_count for git_file in git_files for h in git_file.history}
 
 
 def output_filter(git_files: [GitFile], filter: filter_filters.DraftFilter):
@@ -84,21 +76,30 @@ def output_filter(git_files: [GitFile], filter: filter_filters.DraftFilter):
     for git_file in git_files:
 
         total_files += len(git_file.history)
-        filtered_history = git_file.history[:]  # Copy list to not remove elements from the original list
+        # Split the history in one pass (the original list is not modified)
+        filtered_history = []
+        removed_history = []
 
         h: GitHistoryFile
-        for h in filtered_history[:]:  # Copy list to iterate and remove elements
-            if not filter.is_valid(h):
-                filtered_history.remove(h)
-                filtered_files.append((git_file, filtered_history, h.full_path))
+        for h in git_file.history:
+            if filter.is_valid(h):
+                filtered_history.append(h)
+            else:
+                removed_history.append(h)
+        # All filtered files of the git_file share the filtered history
+        filtered_files.extend((git_file, filtered_history, h.full_path) for h in removed_history)
 
     print("Total filtered files: {} (of {})".format(len(filtered_files), total_files))
     print("Filtered files:")
+    # All lines are printed at once, because printing each file separately is slow for many files
+    lines = []
     for git_file, filtered_history, full_file_path in filtered_files:
-        print("\tFile: {} | History: Before: {} - After: {}  | Path: {}".format(git_file.path,
-                                                                                len(git_file.history),
-                                                                                len(filtered_history),
-                                                                                full_file_path))
+        lines.append("\tFile: {} | History: Before: {} - After: {}  | Path: {}".format(git_file.path,
+                                                                                     len(git_file.history),
+                                                                                     len(filtered_history),
+                                                                                     full_file_path))
+    if len(lines) > 0:
+        print("\n".join(lines))
 
 
 def output_files_change_type(git_files):
@@ -107,14 +108,8 @@ def output_files_change_type(git_files):
     :param git_files: The root files containing the version files
     :return: None
     """
-    change_types = {}
-    for git_file in git_files:
-        h: GitHistoryFile
-        for h in git_file.history:
-            if h.change_type not in change_types:
-                change_types[h.change_type] = 0
-            change_types[h.change_type] += 1
-    print(change_types)
+    change_types = Counter(h.change_type for git_file in git_files for h in git_file.history)
+    print(dict(change_types))
 
 
 def output_all(git_files, git_deleted_files):
@@ -167,11 +162,10 @@ def main():
         }, default_args=default_args_file_changes
     )
 
-    draft_filters = [cla.draft_filter for cla in cla_draft_filter_group.clas if cla.draft_filter is not None]
     draft_filter = None
-    if len(draft_filters) == 1:
+    if cla_draft_filter_group.active_cla is not None:
         # cla_draft_filter_group is a mutually exclusive group - if a filter is set, only one should be set
-        draft_filter = draft_filters[0]
+        draft_filter = cla_draft_filter_group.active_cla.draft_filter
 
     print("#" * 50 + " UNFILTERED " + "#" * 50)
     output_all(git_files, git_deleted_files)
@@ -4,6 +4,8 @@ Clones the history of a repostiroy. Each version (commit) is checked out in a ow
 @author: Michael Fruth
 """
 import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
 from os import path
 
 from git import Repo
@@ -47,33 +49,49 @@ def clone_all(output_directory, git_url):
     :param output_directory: The directory in which all directories are created.
     :param git_url: The git repository to clone all versions from.
     :return: None
+    :raises FileExistsError: If the output_directory already exists.
     """
+    # Created here instead of checking its existence while parsing the arguments
+    os.makedirs(output_directory, exist_ok=False)
     bare_master_directory, bare_master = create_bare_master(output_directory, git_url)
 
-    # Get all "mainline" commits
+    # Get all "mainline" commits (the latest commit first)
     commits = bare_master.iter_commits(first_parent=True)
     commits = list(commits)
 
     # Create commits directory path
     commits_directory = path.join(output_directory, "commits")
 
-    # Clone version of the repository. One commit is one version of the repository.
-    i = 0  # Just used for logging information
-    for commit in commits:
-        i += 1
-        logger.info("Cloning commit %s (%s/%s)" % (commit.hexsha, i, len(commits)))
-
-        # Commit-directoryname consists of the commit count and the commit -hash.
-        # The commit count is the number of total commits made (until to the specific commit/version).
-        # Low number = repository in its early stage; High number = repository in later stages/current state
-        commit_directory_name = util.commit_directory_name(commit.count(first_parent=True), commit.hexsha)
-        commit_directory = path.join(commits_directory, commit_directory_name)
-
-        # Clone the bare-master repo into the commit directory
-        commit_repo = Repo.clone_from(bare_master_directory, commit_directory, no_checkout=True)
-        # Checkout the specific version of the new repository
-        commit_repo.git.checkout(commit.hexsha)
-        # commit_repo.git.reset(commit.hexsha, hard=True) # Use this if you want to lose the commit history to the master
+    # Check out each version of the repository. One commit is one version of the repository.
+    # Commit-directoryname consists of the commit count and the commit -hash.
+    # The commit count is the number of total commits made (until to the specific commit/version), which is the number
+    # of the remaining "mainline" commits.
+    # Low number = repository in its early stage; High number = repository in later stages/current state
+    checkouts = []
+    for i, commit in enumerate(commits):
+        commit_directory_name = util.commit_directory_name(len(commits) - i, commit.hexsha)
+        checkouts.append((i + 1, len(commits), commit.hexsha, path.join(commits_directory, commit_directory_name)))
+
+    # The checkouts are independent of each other and mostly wait for git, so they are done in parallel
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        for _ in executor.map(lambda checkout: _checkout_commit(bare_master, *checkout), checkouts):
+            pass
+
+
+def _checkout_commit(bare_master: Repo, number, total, sha, commit_directory):
+    """
+    Checks out the commit of the bare-master in the commit directory.
+    The commit directory is a worktree of the bare-master (see git worktree), so the objects of the bare-master are
+    shared and not copied. The bare-master must not be moved afterwards (or use git worktree repair).
+    :param bare_master: The bare-master repository.
+    :param number: The number of the commit (just used for logging information).
+    :param total: The total number of commits (just used for logging information).
+    :param sha: The commit-hash.
+    :param commit_directory: The directory in which the commit is checked out.
+    :return: None
+    """
+    logger.info("Checking out commit %s (%s/%s)" % (sha, number, total))
+    bare_master.git.worktree('add', '--detach', commit_directory, sha)
 
 
 def main():
@@ -18,16 +18,18 @@ ORIGINAL_SCHEMA_NAME = "NORMAL"
 DEREFERENCED_SCHEMA_NAME = "NORMAL_REFS"
 
 
-def _check_drafts_and_add(invalid_schema_drafts: SchemaDrafts, json_content, name):
+def _check_drafts_and_add(invalid_schema_drafts: SchemaDrafts, json_content, name, drafts=None):
     """
     Validates the json content against each available draft. The result is stored in invalid_schema_drafts under the
     passed "name"
     :param invalid_schema_drafts: The SchemaDrafts-object which stores the information about the check
     :param json_content: The content to check
     :param name: The name under which the result of the check is stored
+    :param drafts: The result of the validation, if already known (e.g. by util.schema_validate_all_drafts_of_file).
     :return: True if the json content is valid to at least one validator.
     """
-    drafts = util.schema_validate_all_drafts(json_content)
+    if drafts is None:
+        drafts = util.schema_validate_all_drafts(json_content)
     invalid_schema_drafts.add(name, drafts)
 
     if all(v is not None for v in drafts.values()):
@@ -42,25 +44,55 @@ def _multiprocessing_reset(git_history_file: GitHistoryFile, schema_drafts_resul
     schema_drafts_result.git_history_file = git_history_file
 
 
+# The results of _check_file by the content hash of the file. See check_file.
+_results_by_content_hash = {}
+
+
+def _copy_schema_drafts(git_history_file: GitHistoryFile, schema_drafts_result: SchemaDrafts):
+    """
+    Creates a SchemaDrafts-object for the file with the drafts of another file with the same content.
+    :param git_history_file: The file.
+    :param schema_drafts_result: The result of the other file.
+    :return: The SchemaDrafts-object of the file.
+    """
+    schema_drafts_copy = SchemaDrafts(git_history_file)
+    schema_drafts_copy.drafts = dict(schema_drafts_result.drafts)
+    return schema_drafts_copy
+
+
 def check_file(git_history_file: GitHistoryFile):
     """
     Checks the file for different schema drafts. The file is loaded and validated against each available draft-
     validator (Draft 3, 4 ,6 and 7). If the schema is valid to at least on draft, the schema will be derferenced and
     this schema will be checked again with each validator. If the schema is invalid to all validators in the first step,
     this check will not be performed.
+    The result (including the dereferencing) is reused for files with the same content.
+    :param git_history_file: The file to check
+    :return: A SchemaDrafts-object containing all information.
+    """
+    content_hash = util.content_hash(git_history_file.full_path)
+    if content_hash not in _results_by_content_hash:
+        _results_by_content_hash[content_hash] = _check_file(git_history_file)
+    return _copy_schema_drafts(git_history_file, _results_by_content_hash[content_hash])
+
+
+def _check_file(git_history_file: GitHistoryFile):
+    """
+    Checks the file for different schema drafts (see check_file).
     :param git_history_file: The file to check
-    :param check_jsonsubschema: Whether jsonsubschema should be checked (if maybe canonicalization results an invalid schema)
     :return: A SchemaDrafts-object containing all information.
     """
     logger.info("Check file: " + git_history_file.full_path)
     schema_drafts_result = SchemaDrafts(git_history_file)
 
-    content, json_content, encoding, error = util.load_json(git_history_file.full_path)
+    content, json_content, encoding, error = util.load_json_cached(git_history_file.full_path)
     if error:
         return schema_drafts_result
 
     # NORMAL
-    if not _check_drafts_and_add(schema_drafts_result, json_content, ORIGINAL_SCHEMA_NAME):
+    # The validation of the file is reused for files with the same content
+    drafts = util.schema_validate_all_drafts_of_file(git_history_file.full_path)
+    if not _check_drafts_and_add(schema_drafts_result, json_content, ORIGINAL_SCHEMA_NAME, drafts):
         return schema_drafts_result
 
     try:
@@ -78,32 +110,44 @@ def check_file(git_history_file: GitHistoryFile):
     return schema_drafts_result
 
 
-def check_schema_draft(git_file: GitFile):
-    """
-    Checks the schema draft of the version files of a specific root file.
-    :param git_file: The root file from which the version files should be checked.
-    :return: The root file and the result of the check (a list containing SchemaDraft-objects)
-    """
-    logger.info("Check git_file: " + git_file.path)
-    result = util.multiprocess_and_set_files_later(cores=execution_settings.multiprocessing_cores,
-                                                   func=check_file,
-                                                   iterable=git_file.history,
-                                                   use_map=True,
-                                                   reset_func=_multiprocessing_reset)
-    logger.info("End git_file: " + git_file.path)
-    return git_file, result
-
-
 def schema_drafts(output_file, git_files: [GitFile]):
     """
     Classifies each schema based on the draft and saves the result to the output file.
-    :param output_file: The output file in which the result is stored.
+    All versions of all files are checked in one processing pool, so the pool is started only once and the processes are
+    busy also for files with only a few versions. Files with the same content have the same drafts, so only one file per
+    content is checked (the processes don't share the results of check_file).
+    :param output_file: The output file in which the result is stored. The file must not exist.
     :param git_files: The files to check the schema drafts from
     :return: None
     """
-    for git_file in git_files:
-        r = check_schema_draft(git_file)
-        util.append_pickle(output_file, r)
+    all_histories = [h for git_file in git_files for h in git_file.history]
+    histories_by_content_hash = {}
+    for h in all_histories:
+        histories_by_content_hash.setdefault(util.content_hash(h.full_path), h)
+    unique_histories = list(histories_by_content_hash.values())
+
+    unique_results = util.multiprocess_and_set_files_later(cores=execution_settings.multiprocessing_cores,
+                                                           func=check_file,
+                                                           iterable=unique_histories,
+                                                           use_map=True,
+                                                           reset_func=_multiprocessing_reset)
+    results_by_content_hash = dict(zip(histories_by_content_hash.keys(), unique_results))
+    results = []
+    for h in all_histories:
+        result = results_by_content_hash[util.content_hash(h.full_path)]
+        # The checked file gets its own result, the other files with the same content a copy of it
+        results.append(result if result.git_history_file is h else _copy_schema_drafts(h, result))
+
+    def records():
+        # One record for each root file: The root file and the result of the check of its versions (a list
+        # containing SchemaDraft-objects)
+        start = 0
+        for git_file in git_files:
+            end = start + len(git_file.history)
+            yield git_file, results[start:end]
+            start = end
+
+    util.append_pickle_records(output_file, records(), exclusive=True)
 
 
 def main():
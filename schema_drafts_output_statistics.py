@@ -3,16 +3,15 @@
 Outputs statistics about the valid/invalid drafts of the data produced by schema_drafts.py.
 @author: Michael Fruth
 """
+# Imported as module, because the class Counter of this module has the same name as collections.Counter
+import collections
+
 import _util as util
-from _model import GitFile, SchemaDrafts
+from _model import ExecutionSettings, GitFile, GitHistoryFile, SchemaDrafts
 from schema_drafts import ORIGINAL_SCHEMA_NAME, DEREFERENCED_SCHEMA_NAME
 
-
-class CountValue:
-    def __init__(self, schema_draft: SchemaDrafts):
-        self.schema_draft = schema_draft
-        self.schema_tag = schema_draft.git_history_file.schema_tag()
-        self.file = schema_draft.git_history_file.full_path
+# The drafts to which a schema must be valid to be counted as valid to all drafts
+_ALL_VALID_DRAFTS = (util.DRAFT4_NAME, util.DRAFT6_NAME, util.DRAFT7_NAME)
 
 
 class Counter:
@@ -24,34 +23,40 @@ class Counter:
 
     def __init__(self):
         self.files = 0
-        self.names = {}
+        self.names = collections.defaultdict(int)
+        # The files grouped by name, draft and schema tag
         self.valid_drafts = {}
         self.invalid_drafts = {}
+        # The number of schemas valid to all drafts of _ALL_VALID_DRAFTS by name
+        self.valid_to_all_drafts = collections.defaultdict(int)
+        # The number of schemas by the specified schema tag
+        self.schema_tags = collections.Counter()
 
-    def incr_files(self):
+    def incr_files(self, schema_tag):
         self.files += 1
+        self.schema_tags[schema_tag] += 1
 
     def incr_name(self, name):
-        if name not in self.names:
-            self.names[name] = 0
         self.names[name] += 1
 
-    def incr_valid_draft(self, name, draft, count_value: CountValue):
-        self._incr_draft(name, draft, self.valid_drafts, count_value)
+    def incr_valid_to_all_drafts(self, name):
+        self.valid_to_all_drafts[name] += 1
 
-    def incr_invalid_draft(self, name, draft, count_value: CountValue):
-        self._incr_draft(name, draft, self.invalid_drafts, count_value)
+    def incr_valid_draft(self, name, draft, schema_tag, file):
+        self._incr_draft(name, draft, self.valid_drafts, schema_tag, file)
 
-    def _incr_draft(self, name, draft, d, count_value: CountValue):
-        if name not in d:
-            d[name] = {}
-        if draft not in d[name]:
-            d[name][draft] = []
-        d[name][draft].append(count_value)
+    def incr_invalid_draft(self, name, draft, schema_tag, file):
+        self._incr_draft(name, draft, self.invalid_drafts, schema_tag, file)
+
+    def _incr_draft(self, name, draft, d, schema_tag, file):
+        # The files are grouped by the schema tag while counting, so they don't have to be grouped for each output
+        d.setdefault(name, {}).setdefault(draft, {}).setdefault(schema_tag, []).append(file)
 
 
 counter = Counter()
 
+execution_settings = ExecutionSettings()
+
 
 def count_schema_draft(schema_draft: SchemaDrafts):
     """
@@ -59,18 +64,26 @@ def count_schema_draft(schema_draft: SchemaDrafts):
     :param schema_draft: The SchemaDrafts-object
     :return: None
     """
-    counter.incr_files()
+    # The same values are counted for the file and for each name and draft
+    schema_tag = schema_draft.git_history_file.schema_tag(schema_draft.is_loaded())
+    file = schema_draft.git_history_file.full_path
+    counter.incr_files(schema_tag)
 
     for name, drafts in schema_draft.drafts.items():
-        if not all(none_or_ex is not None for none_or_ex in drafts.values()):
-            # Schema must be valid to at least one validator to be counted as valid
-            counter.incr_name(name)
-
+        any_valid = False
         for draft, none_or_ex in drafts.items():
             if none_or_ex is None:
-                counter.incr_valid_draft(name, draft, CountValue(schema_draft))
+                any_valid = True
+                counter.incr_valid_draft(name, draft, schema_tag, file)
             else:
-                counter.incr_invalid_draft(name, draft, CountValue(schema_draft))
+                counter.incr_invalid_draft(name, draft, schema_tag, file)
+
+        if any_valid:
+            # Schema must be valid to at least one validator to be counted as valid
+            counter.incr_name(name)
+
+            if all(drafts[draft] is None for draft in _ALL_VALID_DRAFTS):
+                counter.incr_valid_to_all_drafts(name)
 
 
 def count(git_file: GitFile, schema_drafts: [SchemaDrafts]):
@@ -112,106 +125,81 @@ def output_valid_drafts():
 def _output_valid_or_invalid_drafts(valid_or_invalid_drafts, show_files=False):
     for name, drafts in valid_or_invalid_drafts.items():
         print("{}: {} (Total)".format(name, counter.names[name]))
-        for draft, schema_tags in drafts.items():
-            count = len(schema_tags)
-            files_by_schema_tags = _group_files_by_schema_tag(schema_tags)
+        for draft, files_by_schema_tags in drafts.items():
+            count = sum(len(files) for files in files_by_schema_tags.values())
             print("{} - {}: {}".format(name, draft, count))
             for schema_tag, files in files_by_schema_tags.items():
                 print("\t{}: {}".format(schema_tag, len(files)))
-                if show_files:
-                    [print("\t\t{}".format(file)) for file in files]
-
+                if show_files and len(files) > 0:
+                    print("\n".join("\t\t{}".format(file) for file in files))
 
-def _group_files_by_schema_tag(count_values: [CountValue]):
-    counted_schema_tags = {}
 
-    count_value: CountValue
-    for count_value in count_values:
-        schema_tag = count_value.schema_tag
-        if schema_tag not in counted_schema_tags:
-            counted_schema_tags[schema_tag] = []
-        counted_schema_tags[schema_tag].append(count_value.file)
-    return counted_schema_tags
-
-
-def _count_all_valid_invalid_drafts_for_name(git_files_data, lookup_name, lookup_drafts: []):
+def _count_all_valid_invalid_drafts_for_name(lookup_name):
     """
-    Counts the invalid/valid drafts for a given name (lookup_name) and for only specific drafts (validate_drafts).
-    :param git_files_data: The data containing the SchemaDrafts-objects.
+    Counts the invalid/valid drafts for a given name (lookup_name) and for only the drafts in _ALL_VALID_DRAFTS. The
+    valid drafts are counted in count_schema_draft, so the data doesn't have to be iterated again.
     :param lookup_name: The name for which the valid/invalid drafts should be counted.
-    :param lookup_drafts: The drafts to consider
-    :return: The number of valid/invalid drafts, validated by a given name (lookup_name) and only considering specific draft version (validate_drafts).
+    :return: The number of valid/invalid drafts, validated by a given name (lookup_name) and only considering specific draft version (_ALL_VALID_DRAFTS).
     """
-    valid_draft_schemas = 0
-    invalid_draft_schemas = 0
-
-    for git_file, invalid_schema_drafts in git_files_data:
-        invalid_schema_draft: SchemaDrafts
-        for invalid_schema_draft in invalid_schema_drafts:
-            valid, invalid = _all_drafts_valid_or_valid_for_name(invalid_schema_draft.drafts,
-                                                                 lookup_drafts,
-                                                                 lookup_name)
-            valid_draft_schemas += valid
-            invalid_draft_schemas += invalid
+    valid_draft_schemas = counter.valid_to_all_drafts.get(lookup_name, 0)
+    # A schema without the name is counted as invalid
+    return valid_draft_schemas, counter.files - valid_draft_schemas
 
-    return valid_draft_schemas, invalid_draft_schemas
 
-
-def _all_drafts_valid_or_valid_for_name(drafts_by_name, lookup_drafts: [], lookup_name):
+def output_specified_schema_drafts():
     """
-    Checks if drafts_by_name contains for the specific lookup_drafts only valid drafts (for the specific name (lookup_name))
-    :param drafts_by_name: The dictionary which groups the drafts results by name.
-    :param lookup_drafts: The drafts to lookup for
-    :param lookup_name: The name to lookup for
-    :return: (1,0) if everything is valid, (0,1) otherwise
+    Prints a statistic about the schema tags set in the files. The schema tags are counted in count_schema_draft.
+    :return: None
     """
-    if lookup_name in drafts_by_name:
-        drafts = drafts_by_name[lookup_name]
+    print("Specified Schema Tags (Total files: {}):".format(counter.files))
+    total_value = 0
+    for schema_tag, value in counter.schema_tags.items():
+        print("{}: {}".format(schema_tag, value))
+        total_value += value
+    print("Total: {}".format(total_value))
+
 
-        all_none = True
-        for draft_name in lookup_drafts:
-            if drafts[draft_name] is not None:
-                # Exception occurred, so the schema was not valid to this specific draft.
-                all_none = False
-                break
+def _schema_tag(git_history_file: GitHistoryFile, loads):
+    return git_history_file.schema_tag(loads)
 
-        if all_none:
-            return 1, 0
 
-    return 0, 1
+def _multiprocessing_reset(git_history_file: GitHistoryFile, loads, schema_tag):
+    # The schema tag was loaded by another process, so it's set to the "original" GitHistoryFile
+    git_history_file.set_schema_tag(schema_tag)
 
 
-def output_specified_schema_drafts(git_files_data):
+def load_schema_tags(git_files_data):
     """
-    Prints a statistic about the schema tags set in the files.
-    :param git_files_data: The files to check.
+    Loads the schema tags of all files in parallel. Loading the schema tags (reading the files) is the expensive part of
+    the counting, the counting itself is done afterwards in one process.
+    :param git_files_data: The data containing the SchemaDrafts-objects.
     :return: None
     """
-    schema_tags = {}
-    for git_file, invalid_schema_drafts in git_files_data:
-        invalid_schema_draft: SchemaDrafts
-        for invalid_schema_draft in invalid_schema_drafts:
-            schema_tag = invalid_schema_draft.git_history_file.schema_tag()
-            if schema_tag not in schema_tags:
-                schema_tags[schema_tag] = 0
-            schema_tags[schema_tag] += 1
-
-    print("Specified Schema Tags (Total files: {}):".format(counter.files))
-    total_value = 0
-    for schema_tag, value in schema_tags.items():
-        print("{}: {}".format(schema_tag, value))
-        total_value += value
-    print("Total: {}".format(total_value))
+    git_history_files = [(schema_draft.git_history_file, schema_draft.is_loaded())
+                         for git_file, schema_drafts in git_files_data
+                         for schema_draft in schema_drafts]
+    util.multiprocess_and_set_files_later(cores=execution_settings.multiprocessing_cores,
+                                          func=_schema_tag,
+                                          iterable=git_history_files,
+                                          reset_func=_multiprocessing_reset)
 
 
 def main():
     import _arguments as args
-    show_files, git_files_data = args.parse_load_schema_drafts(
+    show_files, multiprocessing_cores, git_files_data = args.parse_load_schema_drafts(
         {
-            args.CLAShowFiles: args.CLAShowFiles()
-        }
+            args.CLAShowFiles: args.CLAShowFiles(),
+            args.CLAMultiprocessingCores: args.CLAMultiprocessingCores()
+        }, as_records=True
     )
 
+    execution_settings.set_multiprocessing_cores(multiprocessing_cores)
+    if execution_settings.multiprocessing_cores > 1:
+        # All records are needed to distribute them to the processes
+        git_files_data = list(git_files_data)
+        load_schema_tags(git_files_data)
+
+    # All statistics are counted in one pass, so the records are counted while they are loaded
     for git_file, schema_drafts in git_files_data:
         count(git_file, schema_drafts)
 
@@ -222,22 +210,17 @@ def main():
     output_invalid_drafts(show_files)
 
     print("#" * 50)
-    validate_drafts = [util.DRAFT4_NAME, util.DRAFT6_NAME, util.DRAFT7_NAME]
     print("Schemas valid/invalid to all drafts:")
-    print(validate_drafts)
+    print(list(_ALL_VALID_DRAFTS))
 
-    normal_valid, normal_invalid = _count_all_valid_invalid_drafts_for_name(git_files_data,
-                                                                            ORIGINAL_SCHEMA_NAME,
-                                                                            validate_drafts)
+    normal_valid, normal_invalid = _count_all_valid_invalid_drafts_for_name(ORIGINAL_SCHEMA_NAME)
     print("NORMAL valid: {} | invalid: {}".format(normal_valid, normal_invalid))
 
-    normal_refs_valid, normal_refs_invalid = _count_all_valid_invalid_drafts_for_name(git_files_data,
-                                                                                      DEREFERENCED_SCHEMA_NAME,
-                                                                                      validate_drafts)
+    normal_refs_valid, normal_refs_invalid = _count_all_valid_invalid_drafts_for_name(DEREFERENCED_SCHEMA_NAME)
     print("NORMAL REFS valid: {} | invalid: {}".format(normal_refs_valid, normal_refs_invalid))
 
     print("#" * 50)
-    output_specified_schema_drafts(git_files_data)
+    output_specified_schema_drafts()
 
 
 if __name__ == '__main__':
@@ -1,6 +1,6 @@
 import logging
+from collections import Counter
 
-import pandas as pd
 import plotly.express as px
 
 import _util as util
@@ -10,43 +10,51 @@ logger = logging.getLogger(__name__)
 _DRAFT_TO_CHECK = util.DRAFT4_NAME
 
 
-def _create_df(git_file: GitFile, schema_drafts: [SchemaDrafts]):
-    pandas_data = []
+def _count_invalid(schema_drafts: [SchemaDrafts], invalid_counts: Counter):
+    """
+    Counts the files invalid to the draft to check by the invalid type name and the exception.
+    :param schema_drafts: The SchemaDrafts-objects to count.
+    :param invalid_counts: The counts of the (invalid type name, exception) pairs, which are updated.
+    :return: None
+    """
     schema_draft: SchemaDrafts
     for schema_draft in schema_drafts:
+        # The first name (e.g. NORMAL before NORMAL_REFS) for which the file is invalid is counted
         for name, drafts in schema_draft.drafts.items():
-            none_or_ex = schema_draft.drafts[name][_DRAFT_TO_CHECK]
+            none_or_ex = drafts[_DRAFT_TO_CHECK]
             if none_or_ex is not None:
                 none_or_ex = _DRAFT_TO_CHECK + " " + none_or_ex[0]  # 0 = type, 1 = message
                 name = _DRAFT_TO_CHECK + " " + name
-                pandas_data.append((schema_draft.git_history_file.full_path,
-                                    name, none_or_ex,
-                                    name + " | " + none_or_ex))
+                invalid_counts[(name, none_or_ex)] += 1
                 break  # Break loop to get the next file
-    df = pd.DataFrame(pandas_data, columns=['File', 'Invalid_Type_Name', 'Exception', 'Invalid_Type_Name_Exception'])
-    return df
+
+
+def _plot_pie(counts: Counter, title):
+    # The values are already counted, so plotly doesn't have to count each element
+    fig = px.pie(names=list(counts.keys()), values=list(counts.values()))
+    fig.update_layout(title=title)
+    fig.show()
 
 
 def plot(git_files_data: [GitFile, [SchemaDrafts]]):
-    dfs = []
+    invalid_counts = Counter()
     total_elements = 0
     for git_file, schema_drafts in git_files_data:
         total_elements += len(schema_drafts)
-        dfs.append(_create_df(git_file, schema_drafts))
-
-    df = pd.concat(dfs, ignore_index=True)
-
-    fig = px.pie(df, values=[1] * len(df), names='Invalid_Type_Name_Exception')
-    fig.update_layout(title='Combined | Total Elements: {} | Elements: {}'.format(total_elements, len(df)))
-    fig.show()
-
-    fig = px.pie(df, values=[1] * len(df), names='Invalid_Type_Name')
-    fig.update_layout(title='Invalid by name | Total Elements: {} | Elements: {}'.format(total_elements, len(df)))
-    fig.show()
-
-    fig = px.pie(df, values=[1] * len(df), names='Exception')
-    fig.update_layout(title='Exception | Total Elements: {} | Elements: {}'.format(total_elements, len(df)))
-    fig.show()
+        _count_invalid(schema_drafts, invalid_counts)
+
+    elements = sum(invalid_counts.values())
+    combined_counts = Counter()
+    name_counts = Counter()
+    exception_counts = Counter()
+    for (name, exception), count in invalid_counts.items():
+        combined_counts[name + " | " + exception] += count
+        name_counts[name] += count
+        exception_counts[exception] += count
+
+    _plot_pie(combined_counts, 'Combined | Total Elements: {} | Elements: {}'.format(total_elements, elements))
+    _plot_pie(name_counts, 'Invalid by name | Total Elements: {} | Elements: {}'.format(total_elements, elements))
+    _plot_pie(exception_counts, 'Exception | Total Elements: {} | Elements: {}'.format(total_elements, elements))
 
 
 def main():
@@ -54,18 +54,21 @@ def _subschema_file(git_file: GitFile):
 def subschemas(output_file, git_files: [GitFile]):
     """
     Computes the containment of the given files.
-    :param output_file: The output file in which the result is stored.
+    :param output_file: The output file in which the result is stored. The file must not exist.
     :param git_files: The files to check.
     :return: None
     """
-    git_file: GitFile
-    for git_file in git_files:
-        logger.info("Check overall git file: %s" % git_file.path)
+    def records():
+        git_file: GitFile
+        for git_file in git_files:
+            logger.info("Check overall git file: %s" % git_file.path)
 
-        schemas = _subschema_file(git_file)
-        util.append_pickle(output_file, (git_file, schemas))
+            schemas = _subschema_file(git_file)
+            yield git_file, schemas
 
-        logger.info("Finished overall git file: %s" % git_file.path)
+            logger.info("Finished overall git file: %s" % git_file.path)
+
+    util.append_pickle_records(output_file, records(), exclusive=True)
 
 
 def main():
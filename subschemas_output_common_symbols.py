@@ -4,8 +4,9 @@ Outputs statistics about the common symbols of two datas produced by subschemas.
 @author: Michael Fruth
 """
 import logging
-import pickle
+from collections import Counter, defaultdict
 
+import _util as util
 import _util_subschema as subschema_util
 from _model import Subschema
 
@@ -15,7 +16,9 @@ logger = logging.getLogger(__name__)
 def _group_symbols(git_files_data):
     """
     Creates a group for the symbols (decisions of the schema containment). The key is a tuple which contains the files of the containment.
-    :param git_files_data: The data which contains the Subschema-objects.
+    Only the key and the symbol are kept, so the data can be a generator and the Subschema-objects are dropped after
+    they are grouped.
+    :param git_files_data: The data (or a generator of the data) which contains the Subschema-objects.
     :return: A group with a tuple (file_path1, file_path2) as key and the symbol as value.
     """
     group = {}
@@ -23,9 +26,11 @@ def _group_symbols(git_files_data):
         subschema: Subschema
         for subschema in subschemas:
             key = (subschema.s1.full_path, subschema.s2.full_path)
-            if key in group:
-                raise KeyError("Key {} already exists!".format(key))
+            # The key is new if the group grows, so the key is hashed only once
+            size = len(group)
             group[key] = subschema_util.get_symbol(subschema)
+            if len(group) == size:
+                raise KeyError("Key {} already exists!".format(key))
     return group
 
 
@@ -39,8 +44,8 @@ def compare(git_files_data1, git_files_data2, show_files=False):
     ≡ - ⟂: 22
     Means, in 22 times file 1 has decided for equality, while file 2 decided for failure.
 
-    :param git_files_data1: Data 1 to compare
-    :param git_files_data2: Date 2 to compare
+    :param git_files_data1: Data 1 (or a generator of it) to compare
+    :param git_files_data2: Date 2 (or a generator of it) to compare
     :param show_files: Flag if detailed statistics should be printed or only a summary.
     :return:None
     """
@@ -49,46 +54,40 @@ def compare(git_files_data1, git_files_data2, show_files=False):
 
     # Keys (the compared files) must be equal.
     # Do not allow a comparison of two sets, where subschema was computed on different files.
-    if set(grouped_symbols1.keys()) != set(grouped_symbols2.keys()):
+    # The keys are compared as set by the key views, so no sets are created.
+    if grouped_symbols1.keys() != grouped_symbols2.keys():
         raise ValueError(
             "The given files computed subschemas for different files. Compare only equal file sets! (E.g. do NOT compare -self with a file without -self)")
 
-    equal_by_symbol = subschema_util.create_symbol_map(lambda: [])
-    not_equal_by_symbol = subschema_util.create_symbol_map(lambda: subschema_util.create_symbol_map(lambda: []))
+    # The number of files by the symbols of file 1 and file 2. The files themselves are only needed for the details.
+    counts_by_symbols = Counter()
+    files_by_symbols = defaultdict(list) if show_files else None
 
     total_files = 0
     for key in grouped_symbols1.keys():
-        symbol1 = grouped_symbols1[key]
-        symbol2 = grouped_symbols2[key]
-
-        if symbol1 == symbol2:
-            equal_by_symbol[symbol1].append(key)
-        else:
-            not_equal_by_symbol[symbol1][symbol2].append(key)
+        symbols = (grouped_symbols1[key], grouped_symbols2[key])
+        counts_by_symbols[symbols] += 1
+        if show_files:
+            files_by_symbols[symbols].append(key)
         total_files += 1
 
-    # Remove empty symbols
-    equal_by_symbol = {k: v for k, v in equal_by_symbol.items() if len(v) > 0}
-    not_equal_by_symbol = {outer_k: {inner_k: inner_v for inner_k, inner_v in outer_v.items() if len(inner_v) > 0} for
-                           outer_k, outer_v in not_equal_by_symbol.items()}
-    not_equal_by_symbol = {k: v for k, v in not_equal_by_symbol.items() if len(v) > 0}
-
     if show_files:
-        _output_summary(equal_by_symbol, not_equal_by_symbol, total_files, True)
+        _output_summary(counts_by_symbols, total_files, files_by_symbols)
     print("Total: {}".format(total_files))
-    _output_summary(equal_by_symbol, not_equal_by_symbol, total_files)
+    _output_summary(counts_by_symbols, total_files)
 
 
-def _output_summary(equal_by_symbol, not_equal_by_symbol, total_files, print_files=False):
+def _output_summary(counts_by_symbols, total_files, files_by_symbols=None):
     """
-    Outputs the statistics about equal and not equal symbols.
-    :param equal_by_symbol: The equal symbols.
-    :param not_equal_by_symbol: The symbols, which are differently.
+    Outputs the statistics about equal and not equal symbols. The symbols are output in the order of
+    subschema_util.SYMBOLS.
+    :param counts_by_symbols: The number of files by the symbols (symbol of file 1, symbol of file 2).
     :param total_files: The total files
-    :param print_files: If a detailed statistic should be printed or not
+    :param files_by_symbols: The files by the symbols. If they are given, a detailed statistic is printed.
     :return: None
     """
     total_files = float(total_files)
+    print_files = files_by_symbols is not None
 
     if print_files:
         print("+" * 10 + " Details " + "+" * 10)
@@ -96,25 +95,27 @@ def _output_summary(equal_by_symbol, not_equal_by_symbol, total_files, print_fil
         print("+" * 10 + " Summary " + "+" * 10)
 
     print("Equal Symbols:")
-    if len(equal_by_symbol) == 0:
+    equal_symbols = [(symbol, symbol) for symbol in subschema_util.SYMBOLS if (symbol, symbol) in counts_by_symbols]
+    if len(equal_symbols) == 0:
         print("-")
     else:
-        for symbol in equal_by_symbol:
-            files = equal_by_symbol[symbol]
-            print("{}: {} ({:.1f}%)".format(symbol, len(files), len(files) / total_files * 100.))
+        for symbols in equal_symbols:
+            count = counts_by_symbols[symbols]
+            print("{}: {} ({:.1f}%)".format(symbols[0], count, count / total_files * 100.))
             if print_files:
-                [print("\t{}\n\t{}\n".format(file[0], file[1])) for file in files]
+                print("\n".join("\t{}\n\t{}\n".format(file[0], file[1]) for file in files_by_symbols[symbols]))
 
     print("Differently Symbols:")
-    if len(not_equal_by_symbol) == 0:
+    not_equal_symbols = [(symbol1, symbol2) for symbol1 in subschema_util.SYMBOLS for symbol2 in subschema_util.SYMBOLS
+                         if symbol1 != symbol2 and (symbol1, symbol2) in counts_by_symbols]
+    if len(not_equal_symbols) == 0:
         print("-")
     else:
-        for symbol1 in not_equal_by_symbol:
-            for symbol2 in not_equal_by_symbol[symbol1]:
-                files = not_equal_by_symbol[symbol1][symbol2]
-                print("{} - {}: {} ({:.1f}%)".format(symbol1, symbol2, len(files), len(files) / total_files * 100.))
-                if print_files:
-                    [print("\t{} {}".format(file[0], file[1])) for file in files]
+        for symbols in not_equal_symbols:
+            count = counts_by_symbols[symbols]
+            print("{} - {}: {} ({:.1f}%)".format(symbols[0], symbols[1], count, count / total_files * 100.))
+            if print_files:
+                print("\n".join("\t{} {}".format(file[0], file[1]) for file in files_by_symbols[symbols]))
 
     if print_files:
         print("+" * 10 + " End Details " + "+" * 10)
@@ -123,10 +124,11 @@ def _output_summary(equal_by_symbol, not_equal_by_symbol, total_files, print_fil
 
 
 def _load_file(file_path, commit_directory):
-    with open(file_path, 'rb') as f:
-        git_files_data = pickle.load(f)
-        [h.set_full_path(commit_directory) for f in git_files_data for h in f[0].history]
-    return git_files_data
+    # Generator: The records are loaded one after another
+    for f in util.load_pickle_records(file_path):
+        for h in f[0].history:
+            h.set_full_path(commit_directory)
+        yield f
 
 
 def main():
@@ -138,12 +140,14 @@ def main():
         {
             args.CLAInputFile2: args.CLAInputFile2().required(),
             args.CLAShowFiles: args.CLAShowFiles()
-        }, default_args=default_args
+        }, default_args=default_args, as_records=True
     )
     # Process input file with the same arguments/filter applied before
     # The default_args has already all information from the console loaded, so both files will be loaded with the same
     # arguments.
-    git_files_data2 = args.process_input_file(input_file_2, default_args, {}, args_filter.filter_subschemas)
+    # Both files are loaded while they are grouped in compare, so only the symbols are kept in memory.
+    git_files_data2 = args.process_input_file(input_file_2, default_args, {}, args_filter.filter_subschemas,
+                                              as_records=True)
 
     compare(git_files_data1, git_files_data2, show_files)
 
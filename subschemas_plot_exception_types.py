@@ -4,18 +4,25 @@ Outputs and plots statistics about the exception types when a failure occured of
 @author: Michael Fruth
 """
 import logging
+from collections import Counter
 
 import pandas as pd
 import plotly.express as px
 
 import _util_subschema as subschema_util
-from _model import GitFile, Subschema
+from _model import Subschema
 
 logger = logging.getLogger(__name__)
 
 
-def _create_df(git_file: GitFile, subschemas: [Subschema]):
-    pandas_data = []
+def _count_exception_types(subschemas: [Subschema], exception_type_counts: Counter):
+    """
+    Counts the exception types of the failed subschema checks.
+    :param subschemas: The subschemas to count.
+    :param exception_type_counts: The counts of the exception types, which are updated. The key is the exception type or
+    a (sorted) tuple of two different exception types (see _exception_type_name).
+    :return: None
+    """
     subschema: Subschema
     for subschema in subschemas:
         symbol = subschema_util.get_symbol(subschema)
@@ -24,47 +31,55 @@ def _create_df(git_file: GitFile, subschemas: [Subschema]):
             # Get only the exception types
             continue
 
-        # Sort exception types to not have duplicates with different order
-        # E.g.: This avoids "a | b" and "b | a" (only "a | b" is counted twice}
-        exception_types = []
-        if subschema.s1_compare_s2.is_subset_exception is not None:
-            exception_types.append(subschema.s1_compare_s2.is_subset_exception[0])
-        if subschema.s2_compare_s1.is_subset_exception is not None:
-            exception_types.append(subschema.s2_compare_s1.is_subset_exception[0])
-        if len(exception_types) == 0:
+        s1_exception = subschema.s1_compare_s2.is_subset_exception
+        s2_exception = subschema.s2_compare_s1.is_subset_exception
+        if s1_exception is None and s2_exception is None:
             raise ValueError("This should not happen... No exception is given but the subschema has no decision..")
 
-        exception_types.sort()
-        if len(exception_types) == 2 and exception_types[0] != exception_types[1]:
-            exception_type = " | ".join(exception_types)
+        # The type of a given exception can be None (e.g. an npm "Exception" without a message), it's counted as None
+        if s2_exception is None:
+            exception_type = s1_exception[0]
+        elif s1_exception is None or s1_exception[0] == s2_exception[0]:
+            exception_type = s2_exception[0]
+        elif s1_exception[0] is None or (s2_exception[0] is not None and s1_exception[0] < s2_exception[0]):
+            # Sort exception types to not have duplicates with different order (None first)
+            # E.g.: This avoids "a | b" and "b | a" (only "a | b" is counted twice}
+            exception_type = (s1_exception[0], s2_exception[0])
         else:
-            exception_type = exception_types[0]
-        pandas_data.append(exception_type)
+            exception_type = (s2_exception[0], s1_exception[0])
+        exception_type_counts[exception_type] += 1
 
-    df = pd.DataFrame(pandas_data, columns=['Exception_Type'])
-    return df
+
+def _exception_type_name(exception_type):
+    # Two different exception types are joined to one name only once for the counted exception types
+    if isinstance(exception_type, tuple):
+        return " | ".join(str(t) for t in exception_type)
+    return exception_type
 
 
 def plot(git_files_data):
-    dfs = []
+    # Count the excepetion type
+    exception_type_counts = Counter()
     total_pairs = 0
     for git_file, subschemas in git_files_data:
-        dfs.append(_create_df(git_file, subschemas))
+        _count_exception_types(subschemas, exception_type_counts)
         total_pairs += len(subschemas)
 
-    df = pd.concat(dfs, ignore_index=True)
-    # Count the excepetion type
-    df_values = df['Exception_Type'].value_counts().rename_axis('Exception_Type').reset_index(name='Counts')
+    total_errors = sum(exception_type_counts.values())
+    df_values = pd.DataFrame([(_exception_type_name(exception_type), count)
+                              for exception_type, count in exception_type_counts.most_common()],
+                             columns=['Exception_Type', 'Counts'])
     # Compute the percentage of the excepetion type occurrences
-    df_values['Percentage'] = df_values['Counts'] / float(len(df)) * 100
+    df_values['Percentage'] = df_values['Counts'] / float(total_errors) * 100
 
     print(df_values)
     print(df_values.round(1))
     print("Total pairs: {}".format(total_pairs))
-    print("Total errors: {}".format(len(df)))
+    print("Total errors: {}".format(total_errors))
 
-    fig = px.pie(df, values=[1] * len(df), names='Exception_Type')
-    fig.update_layout(title='All | Total Subschemas: {} | Total Symbols: {}'.format(total_pairs, len(df)))
+    # The values are already counted, so plotly doesn't have to count each element
+    fig = px.pie(df_values, values='Counts', names='Exception_Type')
+    fig.update_layout(title='All | Total Subschemas: {} | Total Symbols: {}'.format(total_pairs, total_errors))
     fig.show()
 
 
@@ -4,39 +4,40 @@ Outputs and plots statistics about the different decisions of a particular JSC-t
 @author: Michael Fruth
 """
 import logging
+from collections import Counter
 
 import pandas as pd
 import plotly.express as px
 
 import _util_subschema as subschema_util
-from _model import GitFile, Subschema
+from _model import Subschema
 
 logger = logging.getLogger(__name__)
 
 
-def _create_df(git_file: GitFile, subschemas: [Subschema]):
-    pandas_data = []
+def _count_symbols(subschemas: [Subschema], symbol_counts: Counter):
+    """
+    Counts the decisions (symbols) of the subschema checks.
+    :param subschemas: The subschemas to count.
+    :param symbol_counts: The counts of the symbol names, which are updated.
+    :return: None
+    """
     subschema: Subschema
     for subschema in subschemas:
         symbol = subschema_util.get_symbol(subschema)
-        symbol_name = subschema_util.get_name_for_symbol(symbol)
-        pandas_data.append(symbol_name)
-
-    df = pd.DataFrame(pandas_data, columns=['Symbol'])
-    return df
+        symbol_counts[subschema_util.get_name_for_symbol(symbol)] += 1
 
 
 def plot(git_files_data):
-    dfs = []
+    # Count the symbols
+    symbol_counts = Counter()
     total_pairs = 0
     for git_file, subschemas in git_files_data:
-        dfs.append(_create_df(git_file, subschemas))
+        _count_symbols(subschemas, symbol_counts)
         total_pairs += len(subschemas)
 
-    df = pd.concat(dfs, ignore_index=True)
-    df_len = len(df)
-    # Count the symbols
-    df = df['Symbol'].value_counts().rename_axis('Symbol').reset_index(name='Counts')
+    df_len = sum(symbol_counts.values())
+    df = pd.DataFrame(symbol_counts.most_common(), columns=['Symbol', 'Counts'])
     # Compute the percentage of the symbol occurrences
     df['Percentage'] = df['Counts'] / float(df_len) * 100
 
@@ -0,0 +1,140 @@
+import io
+import os
+import sys
+import tempfile
+import unittest
+from os import path
+from unittest import mock
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+
+import _arguments as args
+import _util as util
+import filter_filters
+from _model import GitHistoryFile
+
+
+class ParseLoadFilterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.commit_directory = path.join(self.directory.name, 'commits')
+        os.mkdir(self.commit_directory)
+        self.filter_file = path.join(self.directory.name, 'filter.pick')
+
+        self.file_filter = filter_filters.FileDraftFilter(filter_filters.DRAFT_FILTERS['Draft4'])
+        self.file_filter.append_invalid(GitHistoryFile('abc', None, 'src/a.json', 'A', 1))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _parse_load_filter(self):
+        argv = ['filter_output.py', '-f', self.filter_file, '-c', self.commit_directory]
+        with mock.patch.object(sys, 'argv', argv):
+            return args.parse_load_filter(verbose=False)
+
+    def _assert_loaded(self, loaded_filter):
+        self.assertIsInstance(loaded_filter, filter_filters.FileDraftFilter)
+        self.assertEqual(len(loaded_filter.invalid_files), 1)
+        invalid_file = loaded_filter.invalid_files[0]
+        self.assertFalse(loaded_filter.is_valid(invalid_file))
+        self.assertEqual(invalid_file.full_path, path.join(self.commit_directory, '1#abc', 'src/a.json'))
+
+    def test_uncompressed(self):
+        util.dump_pickle(self.filter_file, self.file_filter)
+        self._assert_loaded(self._parse_load_filter())
+
+    @unittest.skipIf(util.zstandard is None, "zstandard is not installed")
+    def test_compressed(self):
+        util.dump_pickle(self.filter_file, self.file_filter, compress=True)
+        with open(self.filter_file, 'rb') as f:
+            self.assertEqual(f.read(4), util._ZSTANDARD_MAGIC_NUMBER)
+        self._assert_loaded(self._parse_load_filter())
+
+
+class OutputArgumentsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _parse_load(self, cla_type, *argv):
+        cla = cla_type().required()
+        with mock.patch.object(sys, 'argv', ['script.py', *argv]):
+            args.parse_load({cla_type: cla}, verbose=False)
+        return cla.value
+
+    def test_output_file_is_created_when_written(self):
+        output_file = self._parse_load(args.CLAOutputFile, '-o', path.join(self.directory.name, 'output.pick'))
+        self.assertFalse(path.exists(output_file))
+
+        util.dump_pickle(output_file, 'data', exclusive=True)
+        with self.assertRaises(FileExistsError):
+            util.dump_pickle(output_file, 'other data', exclusive=True)
+        with self.assertRaises(FileExistsError):
+            util.append_pickle_records(output_file, ['record'], exclusive=True)
+        self.assertEqual(util.load_pickle_file(output_file), 'data')
+
+    def test_output_directory_is_not_created(self):
+        output_directory = self._parse_load(args.CLAOutputDirectory, '-od', path.join(self.directory.name, 'output'))
+        self.assertFalse(path.exists(output_directory))
+
+
+class FileChangesSourceGroupTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _parse_load(self, *argv):
+        cla_source_group = args.CLAFileChangesSourceGroup().required()
+        cla_validate = args.CLAGitValidate()
+        with mock.patch.object(sys, 'argv', ['git_file_changes.py', *argv]), \
+                mock.patch.object(sys, 'stderr', io.StringIO()):
+            args.parse_load({args.CLAFileChangesSourceGroup: cla_source_group, args.CLAGitValidate: cla_validate},
+                            verbose=False)
+        return cla_source_group, cla_validate
+
+    def test_commit_directory(self):
+        cla_source_group, cla_validate = self._parse_load('-c', self.directory.name, '-val', self.directory.name)
+        self.assertIsInstance(cla_source_group.active_cla, args.CLACommitDirectory)
+        self.assertEqual(cla_validate.value, path.realpath(self.directory.name))
+
+    def test_bare_master(self):
+        cla_source_group, _ = self._parse_load('-b', self.directory.name)
+        self.assertIsInstance(cla_source_group.active_cla, args.CLABareMaster)
+
+    def test_usage_errors(self):
+        for argv in ([], ['-c', self.directory.name, '-b', self.directory.name],
+                     ['-b', self.directory.name, '-val', self.directory.name]):
+            with self.subTest(argv=argv), self.assertRaises(SystemExit):
+                self._parse_load(*argv)
+
+
+class FusableSkipNumberTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cla_skip_files = args.CLASkipFilesFilter()
+        self.cla_skip_files.value = 2
+        self.cla_number_files = args.CLANumberFilesFilter()
+        self.cla_number_files.value = 3
+        self.cla_paths = args.CLAPathsFilter()
+
+    def test_adjacent(self):
+        self.assertEqual(args._fusable_skip_number_clas([self.cla_paths, self.cla_skip_files, self.cla_number_files]),
+                         (self.cla_skip_files, self.cla_number_files))
+
+    def test_other_cla_in_between(self):
+        self.assertEqual(args._fusable_skip_number_clas([self.cla_skip_files, self.cla_paths, self.cla_number_files]),
+                         (None, None))
+
+    def test_number_before_skip(self):
+        self.assertEqual(args._fusable_skip_number_clas([self.cla_number_files, self.cla_skip_files]), (None, None))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import sys
+import tempfile
+import unittest
+from os import path
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+
+import _util as util
+
+_TAG = 'http://json-schema.org/draft-04/schema#'
+
+
+class SchemaTagFromFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _file(self, name, content):
+        json_file = path.join(self.directory.name, name)
+        with open(json_file, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return json_file
+
+    def test_valid(self):
+        json_file = self._file('valid.json', '{"$schema": "%s", "type": "object"}' % _TAG)
+        self.assertEqual(util.schema_tag_from_file(json_file, loads=True), _TAG)
+        self.assertEqual(util.schema_tag_from_file(json_file), _TAG)
+
+    def test_not_first_entry(self):
+        json_file = self._file('not_first.json', '{"type": "object", "$schema": "%s"}' % _TAG)
+        self.assertEqual(util.schema_tag_from_file(json_file, loads=True), _TAG)
+
+    def test_no_schema_tag(self):
+        json_file = self._file('no_tag.json', '{"properties": {"$schema": {"type": "string"}}}')
+        self.assertIsNone(util.schema_tag_from_file(json_file, loads=True))
+
+    def test_invalid_json(self):
+        # The $schema is found at the beginning, but the json can't be loaded
+        json_file = self._file('invalid.json', '{"$schema": "%s", "type": }' % _TAG)
+        self.assertIsNone(util.schema_tag_from_file(json_file))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import sys
+import tempfile
+import unittest
+from os import path
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+
+import _util_subschema as subschema_util
+from _model import SubschemaComparison
+
+
+class _CountingCompare:
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = []
+
+    def __call__(self, path1, path2):
+        self.calls.append((path1, path2))
+        return self.results.pop(0)
+
+
+class _SchemaFilesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        subschema_util._comparison_cache.clear()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _file(self, name, content):
+        json_file = path.join(self.directory.name, name)
+        with open(json_file, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return json_file
+
+
+class CachedComparisonTest(_SchemaFilesTest):
+
+    def test_reused_result_has_no_duration(self):
+        path1 = self._file('a.json', '{}')
+        path2 = self._file('b.json', '{"type": "string"}')
+        compare = _CountingCompare(SubschemaComparison(True, None, 10.0, 12.5))
+
+        checked = subschema_util._cached_comparison('tool', compare, path1, path2)
+        reused = subschema_util._cached_comparison('tool', compare, path1, path2)
+
+        self.assertEqual(len(compare.calls), 1)
+        self.assertEqual(checked.duration, 2.5)
+        self.assertIsNot(reused, checked)
+        self.assertTrue(reused.is_subset)
+        self.assertIsNone(reused.is_subset_exception)
+        self.assertEqual(reused.start_time, reused.end_time)
+        self.assertEqual(reused.duration, 0)
+
+
+class CompareBothDirectionsTest(_SchemaFilesTest):
+
+    def setUp(self):
+        super().setUp()
+        self.path1 = self._file('a.json', '{"$ref": "missing.json"}')
+        self.path2 = self._file('b.json', '{"type": "string"}')
+
+    def test_skip_second_direction_after_load_error(self):
+        load_error = ("<class 'jsonref.JsonRefError'>", "Unresolvable JSON pointer")
+        compare = _CountingCompare(SubschemaComparison(None, load_error, 1.0, 3.0))
+
+        s1_compare_s2, s2_compare_s1 = subschema_util.compare_both_directions(compare, self.path1, self.path2)
+
+        self.assertEqual(compare.calls, [(self.path1, self.path2)])
+        self.assertIsNone(s2_compare_s1.is_subset)
+        self.assertEqual(s2_compare_s1.is_subset_exception, load_error)
+        self.assertEqual(s2_compare_s1.duration, 0)
+
+    def test_check_second_direction_after_other_errors(self):
+        check_error = ('SyntaxError:', 'Invalid regular expression')
+        compare = _CountingCompare(SubschemaComparison(None, check_error, 1.0, 3.0),
+                                   SubschemaComparison(True, None, 3.0, 4.0))
+
+        s1_compare_s2, s2_compare_s1 = subschema_util.compare_both_directions(compare, self.path1, self.path2)
+
+        self.assertEqual(compare.calls, [(self.path1, self.path2), (self.path2, self.path1)])
+        self.assertTrue(s2_compare_s1.is_subset)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+const difftool = require('json-schema-diff-validator')
+const fs = require('fs')
+const path = require("path");
+const readline = require('readline');
+
+// Printed after the output of each check, so the caller knows when the output of a check is complete.
+const END_OF_OUTPUT = '---END---'
+
+async function check(json1, json2) {
+    const start = Date.now() / 1000
+    try {
+        difftool.validateSchemaCompatibility(json1, json2, {allowNewEnumValue: false})
+        console.log("OK")
+    } catch (e) {
+        console.log("Exception")
+        console.log(e.toString())
+    } finally {
+        const end = Date.now() / 1000
+
+        console.log(start)
+        console.log(end)
+    }
+
+}
+
+function load(file) {
+    const absolutePath = path.resolve(file);
+    try {
+        // Read the file on each check instead of require(), because require() caches the (modified) json
+        return JSON.parse(fs.readFileSync(absolutePath, 'utf8').replace(/^\uFEFF/, ''))
+    } catch (e) {
+        return fs.readFileSync(absolutePath)
+    }
+}
+
+async function handle(line) {
+    if (line.trim().length === 0) {
+        return
+    }
+    const start = Date.now() / 1000
+    try {
+        // Each line contains one check: {"path1": ..., "path2": ...}
+        const request = JSON.parse(line)
+        const json1 = load(request.path1)
+        const json2 = load(request.path2)
+
+        // Remove the schema tag so npm-is-json-schema-subset will handle all schemas.
+        json1.$schema = null
+        json2.$schema = null
+
+        await check(json1, json2)
+    } catch (e) {
+        // The request or the files couldn't be read - print the same output as check() for an exception
+        console.log("Exception")
+        console.log(e.toString())
+        console.log(start)
+        console.log(Date.now() / 1000)
+    } finally {
+        // Always end the output, otherwise the caller waits forever for this check
+        console.log(END_OF_OUTPUT)
+    }
+}
+
+// Process the checks one after another in the order they are received.
+let queue = Promise.resolve()
+readline.createInterface({input: process.stdin, terminal: false}).on('line', (line) => {
+    queue = queue.then(() => handle(line))
+})